@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -24,6 +25,8 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "users",
+    "tasks",
+    "recommendation_algorithm",
 ]
 
 MIDDLEWARE = [
@@ -72,6 +75,56 @@ DATABASES = {
 
 MESSAGE_STORAGE = "django.contrib.messages.storage.session.SessionStorage"
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# The recommendations cache holds ranked results per task and per worker. Entries
+# expire after TIMEOUT seconds.
+# The signal receivers of recommendation_algorithm and the refresh_recommendations
+# command invalidate entries in this cache, so it must be shared by every process
+# serving or refreshing recommendations. With a per-process backend such as
+# LocMemCache, an invalidation only reaches the process that made the change, and
+# the others serve stale rankings until they expire.
+# Set RECOMMENDATIONS_CACHE_URL to a Redis URL to use Redis, shared across hosts and
+# bounded in LRU order when the server runs with maxmemory and the allkeys-lru
+# eviction policy; size it from the hit and miss counters of cache_stats(). Without
+# it, recommendations are cached in files under RECOMMENDATIONS_CACHE_DIR (a
+# directory in the system temporary directory by default), shared by the processes
+# of one host only. That backend is not LRU: once it holds MAX_ENTRIES files, a third
+# of them, picked at random, are deleted, and every set() lists the whole directory
+# to count them, so a miss costs time proportional to MAX_ENTRIES.
+
+if os.environ.get("RECOMMENDATIONS_CACHE_URL"):
+    RECOMMENDATIONS_CACHE = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["RECOMMENDATIONS_CACHE_URL"],
+        "TIMEOUT": 600,
+    }
+else:
+    RECOMMENDATIONS_CACHE = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get(
+            "RECOMMENDATIONS_CACHE_DIR",
+            os.path.join(
+                tempfile.gettempdir(), "freelancehouseholdwork-recommendations"
+            ),
+        ),
+        "TIMEOUT": 600,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    }
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "recommendations": RECOMMENDATIONS_CACHE,
+}
+
+# Gazetteer the locations of workers and tasks are geocoded from: a CSV file with
+# name, latitude and longitude columns. Locations are left without coordinates if it
+# does not exist.
+
+GAZETTEER_PATH = BASE_DIR / "gazetteer.csv"
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -1,28 +1,140 @@
+import json
+import os
+
 import numpy as np
 
+from .ranking import top_n, top_n_rows
+from .similarity import (
+    MAX_MEMORY,
+    nearest_neighbours,
+    pearson_similarity,
+    similarity_matrix,
+    top_neighbours,
+)
+
 
 class CollaborativeFiltering:
-    def __init__(self, ratings):
+    def __init__(
+        self,
+        ratings,
+        n_neighbours=None,
+        mode="user",
+        dtype=np.float64,
+        max_memory=MAX_MEMORY,
+        n_jobs=1,
+        candidate_index=None,
+    ):
         """
         initializes the class with the user-item rating matrix, creates a user-item matrix,
         and creates a similarity matrix based on the user-item matrix.
+
+        With mode="user" the similarity matrix is computed between users; with
+        mode="item" it is computed between items, and a user's predicted rating of an
+        item is the similarity-weighted average of the user's ratings of similar items.
+
+        If n_neighbours is given, only the n_neighbours most similar users (or items) of
+        each user (or item) are kept, by absolute similarity, as arrays of neighbour
+        indices and similarity scores instead of the dense similarity matrix.
+
+        The similarities are computed in blocks of rows whose intermediate arrays stay
+        under max_memory bytes. dtype=np.float32 halves the size of the matrices.
+        With n_jobs > 1 (or -1 for all CPUs) the blocks are computed in parallel by a
+        pool of worker processes.
+
+        With a candidate_index (such as lsh.SimHashIndex) and n_neighbours, the
+        neighbours are chosen among the candidate pairs of the index only, instead of
+        computing the similarity of every pair.
         """
+        if mode not in ("user", "item"):
+            raise ValueError(f"mode must be 'user' or 'item', not {mode!r}")
+        if n_jobs != -1 and n_jobs < 1:
+            raise ValueError(f"n_jobs must be a positive number or -1, not {n_jobs!r}")
+        if candidate_index is not None and n_neighbours is None:
+            raise ValueError("candidate_index requires n_neighbours")
         self.ratings = ratings
-        self.users = np.unique(ratings[:, 0])
-        self.items = np.unique(ratings[:, 1])
-        self.user_item_matrix = self._create_user_item_matrix(ratings)
-        self.similarity_matrix = self._create_similarity_matrix()
+        self.n_neighbours = n_neighbours
+        self.mode = mode
+        self.max_memory = max_memory
+        self.n_jobs = n_jobs
+        self.candidate_index = candidate_index
+        self.users, user_indices = np.unique(ratings[:, 0], return_inverse=True)
+        self.items, item_indices = np.unique(ratings[:, 1], return_inverse=True)
+        self.user_index = {user: i for i, user in enumerate(self.users.tolist())}
+        self.item_index = {item: i for i, item in enumerate(self.items.tolist())}
+        self.user_item_matrix = self._create_user_item_matrix(
+            ratings, user_indices, item_indices, dtype
+        )
+        if n_neighbours is None:
+            self.similarity_matrix = self._create_similarity_matrix()
+        else:
+            self.similarity_matrix = None
+            self.neighbour_indices, self.neighbour_scores = self._create_neighbours()
+
+    def save(self, path):
+        """
+        saves the model to the directory at path as one .npy file per array, so it can
+        be loaded again, memory-mapped, without rebuilding it from the ratings.
+        """
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "users": self.users,
+            "items": self.items,
+            "user_item_matrix": self.user_item_matrix,
+        }
+        if self.similarity_matrix is not None:
+            arrays["similarity_matrix"] = self.similarity_matrix
+        else:
+            arrays["neighbour_indices"] = self.neighbour_indices
+            arrays["neighbour_scores"] = self.neighbour_scores
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        with open(os.path.join(path, "model.json"), "w") as f:
+            json.dump({"n_neighbours": self.n_neighbours, "mode": self.mode}, f)
 
-    def _create_user_item_matrix(self, ratings):
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        loads a model saved with save. With mmap the arrays are opened read-only with
+        np.load(mmap_mode="r"), so loading is near-instant and processes loading the same
+        snapshot share its pages through the OS page cache. A memory-mapped model cannot
+        be updated with add_rating or remove_rating; load it with mmap=False for that.
+        The ratings the model was built from are not saved, so ratings is None.
+        """
+        mmap_mode = "r" if mmap else None
+
+        def load_array(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+
+        with open(os.path.join(path, "model.json")) as f:
+            config = json.load(f)
+        model = cls.__new__(cls)
+        model.ratings = None
+        model.n_neighbours = config["n_neighbours"]
+        model.mode = config.get("mode", "user")
+        model.max_memory = MAX_MEMORY
+        model.n_jobs = 1
+        model.candidate_index = None
+        model.users = load_array("users")
+        model.items = load_array("items")
+        model.user_index = {user: i for i, user in enumerate(model.users.tolist())}
+        model.item_index = {item: i for i, item in enumerate(model.items.tolist())}
+        model.user_item_matrix = load_array("user_item_matrix")
+        if model.n_neighbours is None:
+            model.similarity_matrix = load_array("similarity_matrix")
+        else:
+            model.similarity_matrix = None
+            model.neighbour_indices = load_array("neighbour_indices")
+            model.neighbour_scores = load_array("neighbour_scores")
+        return model
+
+    def _create_user_item_matrix(self, ratings, user_indices, item_indices, dtype):
         """
         creates a user-item matrix from the ratings data, where the rows represent users,
         the columns represent items, and the entries represent the ratings given by the users to the items.
+        The dense row/column indices come from np.unique, so the matrix is filled with a single scatter.
         """
-        user_item_matrix = np.zeros((len(self.users), len(self.items)))
-        for user, item, rating in ratings:
-            user_index = np.where(self.users == user)[0][0]
-            item_index = np.where(self.items == item)[0][0]
-            user_item_matrix[user_index, item_index] = rating
+        user_item_matrix = np.zeros((len(self.users), len(self.items)), dtype=dtype)
+        user_item_matrix[user_indices, item_indices] = ratings[:, 2]
         return user_item_matrix
 
     def _create_similarity_matrix(self):
@@ -30,26 +142,67 @@ class CollaborativeFiltering:
         creates a similarity matrix between users based on their ratings of items.
         The similarity between two users is computed using the Pearson correlation coefficient
         between their ratings of the items that they have both rated.
+        In item mode it is computed between items, over the users who rated both.
+        """
+        return similarity_matrix(
+            self._similarity_source(), self.max_memory, self.n_jobs
+        )
+
+    def _create_neighbours(self):
+        """
+        creates the pruned similarity structure: for every user (or item), the indices of
+        and similarity scores with the n_neighbours users (or items) with the strongest
+        similarity.
         """
-        similarity_matrix = np.zeros((len(self.users), len(self.users)))
-        for i in range(len(self.users)):
-            for j in range(len(self.users)):
-                if i != j:
-                    user1_items = self.user_item_matrix[i, :]
-                    user2_items = self.user_item_matrix[j, :]
-                    common_items = np.logical_and(user1_items != 0, user2_items != 0)
-                    if np.sum(common_items) > 0:
-                        user1_ratings = user1_items[common_items]
-                        user2_ratings = user2_items[common_items]
-                        similarity = np.corrcoef(user1_ratings, user2_ratings)[0, 1]
-                        similarity_matrix[i, j] = similarity
-        return similarity_matrix
+        if self.candidate_index is not None:
+            return self.candidate_index.nearest_neighbours(
+                self._similarity_source(), self.n_neighbours, self.max_memory
+            )
+        return nearest_neighbours(
+            self._similarity_source(), self.n_neighbours, self.max_memory, self.n_jobs
+        )
+
+    def _similarity_source(self):
+        """
+        returns the matrix whose rows the similarities are computed between: the
+        user-item matrix in user mode and its transpose in item mode.
+        """
+        if self.mode == "item":
+            return self.user_item_matrix.T
+        return self.user_item_matrix
+
+    def _neighbours(self, index):
+        """
+        returns the neighbours of a user (or an item in item mode) and the similarity
+        scores with them. Without pruning every user (or item) is a neighbour.
+        """
+        if self.similarity_matrix is not None:
+            return slice(None), self.similarity_matrix[index, :]
+        return self.neighbour_indices[index], self.neighbour_scores[index]
+
+    def _similarity_rows(self, indices):
+        """
+        returns the dense rows of the similarity matrix for the given users (or items).
+        """
+        if self.similarity_matrix is not None:
+            return self.similarity_matrix[indices, :]
+        similarity_rows = np.zeros(
+            (len(indices), len(self.neighbour_indices)),
+            dtype=self.neighbour_scores.dtype,
+        )
+        np.put_along_axis(
+            similarity_rows,
+            self.neighbour_indices[indices],
+            self.neighbour_scores[indices],
+            axis=1,
+        )
+        return similarity_rows
 
     def _get_user_ratings(self, user):
         """
         returns the rating vector for a given user.
         """
-        user_index = np.where(self.users == user)[0][0]
+        user_index = self.user_index[user]
         return self.user_item_matrix[user_index, :]
 
     def _predict_rating(self, user, item):
@@ -57,11 +210,19 @@ class CollaborativeFiltering:
         predicts the rating that a user would give to an item based on the ratings of other
         users who have rated that item. The prediction is made by multiplying the ratings of the
         other users by their similarity scores with the target user and taking the weighted average of the resulting ratings.
+        In item mode it is the weighted average of the user's ratings of the items most similar to the item.
         """
-        user_index = np.where(self.users == user)[0][0]
-        item_index = np.where(self.items == item)[0][0]
-        user_ratings = self.user_item_matrix[:, item_index]
-        similarity_scores = self.similarity_matrix[user_index, :]
+        if self.mode == "item":
+            neighbours, similarity_scores = self._neighbours(self.item_index[item])
+            user_ratings = self.user_item_matrix[self.user_index[user], neighbours]
+            rated = user_ratings != 0
+            normaliser = np.sum(np.abs(similarity_scores[rated]))
+            if normaliser == 0:
+                return 0
+            return np.sum(similarity_scores[rated] * user_ratings[rated]) / normaliser
+        neighbours, similarity_scores = self._neighbours(self.user_index[user])
+        item_index = self.item_index[item]
+        user_ratings = self.user_item_matrix[neighbours, item_index]
         weighted_ratings = user_ratings * similarity_scores
         weighted_ratings = weighted_ratings[weighted_ratings != 0]
         if np.sum(np.abs(weighted_ratings)) == 0:
@@ -69,17 +230,202 @@ class CollaborativeFiltering:
         else:
             return np.sum(weighted_ratings) / np.sum(np.abs(similarity_scores))
 
+    def _predict_ratings(self, user_index):
+        """
+        predicts the ratings that a user would give to every item in one pass. This is the
+        vectorized form of _predict_rating: one similarity-vector x matrix product divided by
+        the total absolute similarity of the user. Given an array of user indices, it returns
+        one row of predictions per user from a single matrix-matrix product.
+        """
+        if self.mode == "item":
+            return self._predict_ratings_from_items(user_index)
+        if np.ndim(user_index) == 0:
+            neighbours, similarity_scores = self._neighbours(user_index)
+            ratings = self.user_item_matrix[neighbours, :]
+        else:
+            similarity_scores = self._similarity_rows(user_index)
+            ratings = self.user_item_matrix
+        normaliser = np.sum(np.abs(similarity_scores), axis=-1, keepdims=True)
+        weighted_ratings = similarity_scores @ ratings
+        return np.divide(
+            weighted_ratings,
+            normaliser,
+            out=np.zeros_like(weighted_ratings),
+            where=normaliser != 0,
+        )
+
+    def _predict_ratings_from_items(self, user_index):
+        """
+        predicts the ratings that a user would give to every item in item mode. For a
+        single user this is a sparse dot product of the item similarities with the items
+        the user has rated, normalised by the absolute similarity of those items; for an
+        array of users it is one matrix-matrix product with the item similarity matrix.
+        """
+        if np.ndim(user_index) != 0:
+            similarity_matrix = self._similarity_rows(np.arange(len(self.items)))
+            user_ratings = self.user_item_matrix[user_index, :]
+            weighted_ratings = user_ratings @ similarity_matrix.T
+            normaliser = (user_ratings != 0) @ np.abs(similarity_matrix).T
+        elif self.similarity_matrix is not None:
+            user_ratings = self.user_item_matrix[user_index, :]
+            rated_items = np.flatnonzero(user_ratings)
+            similarity_scores = self.similarity_matrix[:, rated_items]
+            weighted_ratings = similarity_scores @ user_ratings[rated_items]
+            normaliser = np.sum(np.abs(similarity_scores), axis=1)
+        else:
+            user_ratings = self.user_item_matrix[user_index, :]
+            neighbour_ratings = user_ratings[self.neighbour_indices]
+            weighted_ratings = np.sum(self.neighbour_scores * neighbour_ratings, axis=1)
+            normaliser = np.sum(
+                np.abs(self.neighbour_scores) * (neighbour_ratings != 0), axis=1
+            )
+        return np.divide(
+            weighted_ratings,
+            normaliser,
+            out=np.zeros_like(weighted_ratings),
+            where=normaliser != 0,
+        )
+
     def recommend_workers(self, user, n=5):
         """
         recommends a set of n items to a given user based on their ratings of other items.
-        It does this by first finding the unrated items for the user, predicting their ratings
-        using the _predict_rating function, and then returning the top n items with the highest predicted ratings.
-        """
-        user_ratings = self._get_user_ratings(user)
-        unrated_items = np.where(user_ratings == 0)[0]
-        predicted_ratings = []
-        for item in unrated_items:
-            rating = self._predict_rating(user, self.items[item])
-            predicted_ratings.append((self.items[item], rating))
-        top_n = sorted(predicted_ratings, key=lambda x: x[1], reverse=True)[:n]
-        return top_n
+        It does this by predicting the ratings of all items at once, keeping the items the user
+        has not rated, and selecting the top n of those with np.argpartition before sorting only them.
+        """
+        user_index = self.user_index[user]
+        unrated_items = np.flatnonzero(self.user_item_matrix[user_index, :] == 0)
+        predicted_ratings = self._predict_ratings(user_index)[unrated_items]
+        top_items = top_n(predicted_ratings, n)
+        return [
+            (self.items[unrated_items[index]], predicted_ratings[index])
+            for index in top_items
+        ]
+
+    def recommend_workers_batch(self, users, n=5, block_size=1024):
+        """
+        recommends n items to each of the given users. Users are scored block_size at a time
+        with one matrix-matrix product per block, so memory stays bounded by
+        block_size x number of items. The result is three flat arrays (user_ids, item_ids,
+        scores) holding each user's recommendations in descending order of score, the same
+        ones recommend_workers returns for that user.
+        """
+        user_indices = np.array([self.user_index[user] for user in users], dtype=int)
+        user_ids, item_ids, scores = [], [], []
+        for start in range(0, len(user_indices), block_size):
+            block = user_indices[start : start + block_size]
+            predicted_ratings = self._predict_ratings(block)
+            predicted_ratings[self.user_item_matrix[block, :] != 0] = -np.inf
+            top_items = top_n_rows(predicted_ratings, n)
+            top_scores = np.take_along_axis(predicted_ratings, top_items, axis=1)
+            recommended = np.isfinite(top_scores)
+            block_users = np.broadcast_to(self.users[block][:, None], top_items.shape)
+            user_ids.append(block_users[recommended])
+            item_ids.append(self.items[top_items[recommended]])
+            scores.append(top_scores[recommended])
+        if not user_ids:
+            return self.users[:0], self.items[:0], np.zeros(0)
+        return (
+            np.concatenate(user_ids),
+            np.concatenate(item_ids),
+            np.concatenate(scores),
+        )
+
+    def add_rating(self, user, item, rating):
+        """
+        adds or replaces the rating a user gave to an item without rebuilding the model.
+        Unknown users and items are appended to the index, and only the similarities of
+        the rating user (or the rated item in item mode) with the other users (or items)
+        are recomputed.
+        """
+        if user not in self.user_index:
+            self._add_user(user)
+        if item not in self.item_index:
+            self._add_item(item)
+        user_index, item_index = self.user_index[user], self.item_index[item]
+        self.user_item_matrix[user_index, item_index] = rating
+        self._update_similarity(item_index if self.mode == "item" else user_index)
+
+    def remove_rating(self, user, item):
+        """
+        removes the rating a user gave to an item without rebuilding the model. The user
+        and the item stay in the index.
+        """
+        user_index, item_index = self.user_index[user], self.item_index[item]
+        self.user_item_matrix[user_index, item_index] = 0
+        self._update_similarity(item_index if self.mode == "item" else user_index)
+
+    def _add_user(self, user):
+        """
+        appends a user without ratings to the index and the user-item matrix, and in
+        user mode to the similarity structure.
+        """
+        self.user_index[user] = len(self.users)
+        self.users = np.append(self.users, user)
+        self.user_item_matrix = np.pad(self.user_item_matrix, ((0, 1), (0, 0)))
+        if self.mode == "user":
+            self._grow_similarity()
+
+    def _add_item(self, item):
+        """
+        appends an item without ratings to the index and the user-item matrix, and in
+        item mode to the similarity structure.
+        """
+        self.item_index[item] = len(self.items)
+        self.items = np.append(self.items, item)
+        self.user_item_matrix = np.pad(self.user_item_matrix, ((0, 0), (0, 1)))
+        if self.mode == "item":
+            self._grow_similarity()
+
+    def _grow_similarity(self):
+        """
+        appends a row (and column) without similarities to the similarity structure for
+        a new user (or item in item mode).
+        """
+        index = len(self._similarity_source()) - 1
+        if self.similarity_matrix is not None:
+            self.similarity_matrix = np.pad(self.similarity_matrix, ((0, 1), (0, 1)))
+            return
+        # Every row gets a placeholder entry for the new user while there is room for
+        # more neighbours; _update_similarity fills in the actual scores.
+        if self.neighbour_indices.shape[1] < self.n_neighbours:
+            self.neighbour_indices = np.pad(
+                self.neighbour_indices, ((0, 0), (0, 1)), constant_values=index
+            )
+            self.neighbour_scores = np.pad(self.neighbour_scores, ((0, 0), (0, 1)))
+        self.neighbour_indices = np.pad(self.neighbour_indices, ((0, 1), (0, 0)))
+        self.neighbour_scores = np.pad(self.neighbour_scores, ((0, 1), (0, 0)))
+
+    def _update_similarity(self, index):
+        """
+        recomputes the similarities between one user (or item in item mode) and all
+        others after its ratings changed. In the pruned structure its own neighbours are
+        recomputed; every other row gets the new score if it already has it as a
+        neighbour, or replaces its weakest neighbour if the new score is stronger.
+        A neighbour that became weaker is kept until the next full rebuild.
+        """
+        similarity = pearson_similarity(self._similarity_source(), index, index + 1)[0]
+        if self.similarity_matrix is not None:
+            self.similarity_matrix[index, :] = similarity
+            self.similarity_matrix[:, index] = similarity
+            return
+
+        indices, scores = top_neighbours(
+            similarity[None, :], self.neighbour_indices.shape[1]
+        )
+        self.neighbour_indices[index] = indices[0]
+        self.neighbour_scores[index] = scores[0]
+
+        neighbour = self.neighbour_indices == index
+        neighbour[index] = False
+        rows, columns = np.nonzero(neighbour)
+        self.neighbour_scores[rows, columns] = similarity[rows]
+
+        rows = np.arange(len(self.neighbour_indices))
+        weakest = np.argmin(np.abs(self.neighbour_scores), axis=1)
+        replace = (
+            ~neighbour.any(axis=1)
+            & (rows != index)
+            & (np.abs(similarity) > np.abs(self.neighbour_scores[rows, weakest]))
+        )
+        self.neighbour_indices[rows[replace], weakest[replace]] = index
+        self.neighbour_scores[rows[replace], weakest[replace]] = similarity[replace]
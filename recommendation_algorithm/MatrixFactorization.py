@@ -0,0 +1,224 @@
+import json
+import os
+
+import numpy as np
+
+from .ranking import top_n, top_n_rows
+from .similarity import MAX_MEMORY
+
+
+class MatrixFactorization:
+    def __init__(
+        self,
+        ratings,
+        n_factors=50,
+        regularization=0.1,
+        n_iterations=15,
+        seed=0,
+        max_memory=MAX_MEMORY,
+    ):
+        """
+        initializes the class with the user-item rating matrix and learns n_factors
+        dimensional user and item factors with alternating least squares, so that the
+        predicted rating of an item by a user is the global mean rating plus the dot
+        product of their factors. Only the observed ratings are fitted; regularization
+        is scaled by the number of ratings of each user or item (ALS-WR).
+
+        It has the same recommend_workers / recommend_workers_batch interface as
+        CollaborativeFiltering, and its factors can be saved and memory-mapped.
+
+        Each least squares step assembles the normal equations of blocks of rows whose
+        n_factors x n_factors outer products stay under max_memory bytes.
+        """
+        self.users, user_indices = np.unique(ratings[:, 0], return_inverse=True)
+        self.items, item_indices = np.unique(ratings[:, 1], return_inverse=True)
+        self.user_index = {user: i for i, user in enumerate(self.users.tolist())}
+        self.item_index = {item: i for i, item in enumerate(self.items.tolist())}
+        values = ratings[:, 2].astype(np.float64)
+        self.global_mean = float(np.mean(values)) if len(values) else 0.0
+
+        by_user = _compressed(user_indices, item_indices, values, len(self.users))
+        by_item = _compressed(item_indices, user_indices, values, len(self.items))
+        self.rated_indptr, self.rated_items = by_user[0], by_user[1]
+
+        rng = np.random.default_rng(seed)
+        self.user_factors = np.zeros((len(self.users), n_factors))
+        self.item_factors = rng.normal(
+            scale=1 / np.sqrt(n_factors), size=(len(self.items), n_factors)
+        )
+        for _ in range(n_iterations):
+            self.user_factors = _least_squares(
+                self.item_factors,
+                *by_user,
+                self.global_mean,
+                regularization,
+                max_memory,
+            )
+            self.item_factors = _least_squares(
+                self.user_factors,
+                *by_item,
+                self.global_mean,
+                regularization,
+                max_memory,
+            )
+
+    def save(self, path):
+        """
+        saves the users, items, factors and rated items to the directory at path as .npy
+        files, so serving can load them without retraining.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in (
+            "users",
+            "items",
+            "user_factors",
+            "item_factors",
+            "rated_indptr",
+            "rated_items",
+        ):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "model.json"), "w") as f:
+            json.dump({"global_mean": self.global_mean}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        loads a model saved with save, memory-mapping the arrays read-only if mmap.
+        """
+        mmap_mode = "r" if mmap else None
+        model = cls.__new__(cls)
+        for name in (
+            "users",
+            "items",
+            "user_factors",
+            "item_factors",
+            "rated_indptr",
+            "rated_items",
+        ):
+            array = np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+            setattr(model, name, array)
+        with open(os.path.join(path, "model.json")) as f:
+            model.global_mean = json.load(f)["global_mean"]
+        model.user_index = {user: i for i, user in enumerate(model.users.tolist())}
+        model.item_index = {item: i for i, item in enumerate(model.items.tolist())}
+        return model
+
+    def _rated_items(self, user_index):
+        """
+        returns the indices of the items a user has rated.
+        """
+        start, stop = self.rated_indptr[user_index], self.rated_indptr[user_index + 1]
+        return self.rated_items[start:stop]
+
+    def _predict_ratings(self, user_index):
+        """
+        predicts the ratings that a user (or, given an array of user indices, each of
+        those users) would give to every item.
+        """
+        return self.global_mean + self.user_factors[user_index] @ self.item_factors.T
+
+    def _predict_rating(self, user, item):
+        """
+        predicts the rating that a user would give to an item.
+        """
+        user_factors = self.user_factors[self.user_index[user]]
+        item_factors = self.item_factors[self.item_index[item]]
+        return self.global_mean + user_factors @ item_factors
+
+    def recommend_workers(self, user, n=5):
+        """
+        recommends the n items with the highest predicted ratings that a given user has
+        not rated, from one dot product of the user's factors with the item factors.
+        """
+        user_index = self.user_index[user]
+        predicted_ratings = self._predict_ratings(user_index)
+        predicted_ratings[self._rated_items(user_index)] = -np.inf
+        top_items = top_n(predicted_ratings, n)
+        return [
+            (self.items[index], predicted_ratings[index])
+            for index in top_items
+            if np.isfinite(predicted_ratings[index])
+        ]
+
+    def recommend_workers_batch(self, users, n=5, block_size=1024):
+        """
+        recommends n items to each of the given users, block_size users at a time, and
+        returns three flat arrays (user_ids, item_ids, scores) like
+        CollaborativeFiltering.recommend_workers_batch.
+        """
+        user_indices = np.array([self.user_index[user] for user in users], dtype=int)
+        user_ids, item_ids, scores = [], [], []
+        for start in range(0, len(user_indices), block_size):
+            block = user_indices[start : start + block_size]
+            predicted_ratings = self._predict_ratings(block)
+            counts = self.rated_indptr[block + 1] - self.rated_indptr[block]
+            rated = np.concatenate([self._rated_items(index) for index in block])
+            predicted_ratings[np.repeat(np.arange(len(block)), counts), rated] = -np.inf
+            top_items = top_n_rows(predicted_ratings, n)
+            top_scores = np.take_along_axis(predicted_ratings, top_items, axis=1)
+            recommended = np.isfinite(top_scores)
+            block_users = np.broadcast_to(self.users[block][:, None], top_items.shape)
+            user_ids.append(block_users[recommended])
+            item_ids.append(self.items[top_items[recommended]])
+            scores.append(top_scores[recommended])
+        if not user_ids:
+            return self.users[:0], self.items[:0], np.zeros(0)
+        return (
+            np.concatenate(user_ids),
+            np.concatenate(item_ids),
+            np.concatenate(scores),
+        )
+
+
+def _compressed(rows, columns, values, n_rows):
+    """
+    returns the ratings in compressed sparse row form (indptr, indices, values), with
+    the rows given by rows and the columns by columns.
+    """
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_rows + 1, dtype=np.intp)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, columns[order], values[order]
+
+
+def _least_squares(
+    fixed, indptr, indices, values, global_mean, regularization, max_memory=MAX_MEMORY
+):
+    """
+    solves the regularized least squares problem of one alternating least squares step
+    for every row of a compressed sparse row matrix, given the factors of the other
+    side. The normal equations of a block of rows are assembled from the outer products
+    of the fixed factors of their ratings and solved with one batched np.linalg.solve.
+    A block holds as many ratings as have outer products under max_memory bytes; a
+    row with more ratings than that is a block of its own, assembled with one matrix
+    product instead.
+    """
+    n_rows, n_factors = len(indptr) - 1, fixed.shape[1]
+    factors = np.zeros((n_rows, n_factors))
+    counts = np.diff(indptr)
+    ratings_per_block = max(int(max_memory // (n_factors * n_factors * 8)), 1)
+    start = 0
+    while start < n_rows:
+        # Take rows until the block holds ratings_per_block ratings (at least one row).
+        limit = indptr[start] + ratings_per_block
+        stop = max(int(np.searchsorted(indptr, limit, side="right")) - 1, start + 1)
+        stop = min(stop, n_rows)
+        rated = np.flatnonzero(counts[start:stop]) + start
+        if len(rated):
+            ratings = slice(indptr[start], indptr[stop])
+            rated_factors = fixed[indices[ratings]]
+            residuals = values[ratings] - global_mean
+            offsets = indptr[rated] - indptr[start]
+            if len(rated_factors) > ratings_per_block:
+                gram = (rated_factors.T @ rated_factors)[None]
+            else:
+                gram = np.add.reduceat(
+                    rated_factors[:, :, None] * rated_factors[:, None, :], offsets
+                )
+            right_hand_side = np.add.reduceat(
+                rated_factors * residuals[:, None], offsets
+            )
+            gram += (regularization * counts[rated])[:, None, None] * np.eye(n_factors)
+            factors[rated] = np.linalg.solve(gram, right_hand_side[..., None])[..., 0]
+        start = stop
+    return factors
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RecommendationAlgorithmConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recommendation_algorithm'
+
+    def ready(self):
+        import recommendation_algorithm.signals
@@ -0,0 +1,319 @@
+"""
+Benchmarks for the recommendation engine.
+
+Run with:
+
+    python -m recommendation_algorithm.benchmarks parallel --users 20000 --jobs 1 2 4 8
+    python -m recommendation_algorithm.benchmarks lsh --users 20000 --tables 8 16
+    python -m recommendation_algorithm.benchmarks engine --users 1000 10000 100000 \
+        --density 0.01 --output results.json
+
+The engine benchmark times every phase of CollaborativeFiltering (matrix build,
+similarity build, single-user and batch recommendations) on synthetic ratings at each
+scale and records the peak memory NumPy and Python allocated during the phase, measured
+with tracemalloc. Its JSON output includes the git commit, so results of two commits can
+be compared directly.
+
+NumPy's BLAS may itself use several threads; set OMP_NUM_THREADS=1 (or
+OPENBLAS_NUM_THREADS=1 / MKL_NUM_THREADS=1) to measure process-level scaling alone.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+from .CollaborativeFiltering import CollaborativeFiltering
+from .lsh import SimHashIndex
+from .similarity import nearest_neighbours, similarity_matrix
+
+
+def synthetic_ratings_matrix(n_users, n_items, density, rank=5, seed=0):
+    """
+    returns a random n_users x n_items user-item matrix with ratings from 1 to 5 in
+    roughly density of its cells and 0 elsewhere. The ratings come from random rank
+    dimensional user and item factors, so that users have real neighbours.
+    """
+    rng = np.random.default_rng(seed)
+    user_factors = rng.standard_normal((n_users, rank))
+    item_factors = rng.standard_normal((n_items, rank))
+    matrix = np.rint(3 + 1.5 * (user_factors @ item_factors.T) / np.sqrt(rank))
+    matrix = np.clip(matrix, 1, 5)
+    matrix[rng.random((n_users, n_items)) >= density] = 0
+    return matrix
+
+
+def synthetic_ratings(n_users, n_items, density, rank=5, seed=0):
+    """
+    returns an n x 3 array of (user, item, rating) rows covering roughly density of the
+    n_users x n_items user-item pairs, with ratings from 1 to 5 drawn like those of
+    synthetic_ratings_matrix. Only the rated pairs are generated, so memory stays
+    linear in the number of ratings.
+    """
+    rng = np.random.default_rng(seed)
+    user_factors = rng.standard_normal((n_users, rank))
+    item_factors = rng.standard_normal((n_items, rank))
+    n_ratings = round(density * n_users * n_items)
+    cells = np.unique(rng.integers(0, n_users * n_items, n_ratings))
+    users, items = np.divmod(cells, n_items)
+    scores = np.einsum("ij,ij->i", user_factors[users], item_factors[items])
+    ratings = np.clip(np.rint(3 + 1.5 * scores / np.sqrt(rank)), 1, 5)
+    return np.column_stack([users, items, ratings]).astype(np.float64)
+
+
+class PhaseRecorder:
+    """
+    Records the wall-clock time and the peak memory traced by tracemalloc above the
+    memory already in use, of consecutive named phases. Starting a phase ends the
+    running one.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self._name = None
+
+    def start(self, name):
+        self.stop()
+        tracemalloc.reset_peak()
+        self._name = name
+        self._memory = tracemalloc.get_traced_memory()[0]
+        self._start = time.perf_counter()
+
+    def stop(self):
+        if self._name is None:
+            return
+        seconds = time.perf_counter() - self._start
+        peak_memory = tracemalloc.get_traced_memory()[1] - self._memory
+        self.phases[self._name] = {"seconds": seconds, "peak_memory": peak_memory}
+        self._name = None
+
+
+class _RecordedCollaborativeFiltering(CollaborativeFiltering):
+    """
+    CollaborativeFiltering whose constructor records the user-item matrix build and the
+    similarity build as separate phases.
+    """
+
+    def __init__(self, ratings, recorder, **kwargs):
+        self.recorder = recorder
+        recorder.start("matrix_build")
+        super().__init__(ratings, **kwargs)
+        recorder.stop()
+
+    def _create_similarity_matrix(self):
+        self.recorder.start("similarity_build")
+        return super()._create_similarity_matrix()
+
+    def _create_neighbours(self):
+        self.recorder.start("similarity_build")
+        return super()._create_neighbours()
+
+
+def benchmark_engine(ratings, n_neighbours=None, n=5, n_single_users=100, **kwargs):
+    """
+    builds a CollaborativeFiltering model from the ratings and times its phases: the
+    user-item matrix build, the similarity build, recommend_workers for n_single_users
+    users and recommend_workers_batch for every user. Extra keyword arguments go to the
+    model. Returns a dict mapping each phase to its seconds and peak memory in bytes;
+    the single-user phase also reports the mean seconds per call.
+    """
+    recorder = PhaseRecorder()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        model = _RecordedCollaborativeFiltering(
+            ratings, recorder, n_neighbours=n_neighbours, **kwargs
+        )
+        users = model.users[: min(n_single_users, len(model.users))]
+        recorder.start("recommend_single")
+        for user in users:
+            model.recommend_workers(user, n)
+        recorder.start("recommend_batch")
+        model.recommend_workers_batch(model.users, n)
+        recorder.stop()
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    recorder.phases["recommend_single"]["seconds_per_user"] = recorder.phases[
+        "recommend_single"
+    ]["seconds"] / max(len(users), 1)
+    return recorder.phases
+
+
+def environment():
+    """
+    returns the git commit, Python, NumPy and platform versions the benchmarks run on.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def benchmark_parallel_similarity(matrix, jobs, n_neighbours=None):
+    """
+    times the similarity build of the matrix for every number of worker processes in
+    jobs, and checks that each parallel result is identical to the serial one. Returns
+    a list of (n_jobs, seconds, speedup) tuples.
+    """
+    results = []
+    expected = None
+    for n_jobs in jobs:
+        start = time.perf_counter()
+        if n_neighbours is None:
+            similarity = similarity_matrix(matrix, n_jobs=n_jobs)
+        else:
+            similarity = nearest_neighbours(matrix, n_neighbours, n_jobs=n_jobs)[1]
+        seconds = time.perf_counter() - start
+        if expected is None:
+            expected, serial_seconds = similarity, seconds
+        elif not np.array_equal(similarity, expected):
+            raise AssertionError(f"n_jobs={n_jobs} differs from n_jobs={jobs[0]}")
+        results.append((n_jobs, seconds, serial_seconds / seconds))
+    return results
+
+
+def benchmark_candidate_index(matrix, n_neighbours, settings, seed=0):
+    """
+    compares the exact nearest neighbours of the rows of the matrix with those found
+    by a SimHashIndex for every (n_tables, n_bits) in settings. Returns the exact build
+    time and a list of (n_tables, n_bits, seconds, candidates per row, recall@k)
+    tuples. Many pairs tie on their similarity, so recall@k does not ask for the exact
+    neighbour ids: a neighbour the index returns counts as a hit if its absolute
+    similarity is at least that of the row's exact k-th neighbour. It is the number
+    of hits, capped per row at its number of exact neighbours with a non-zero
+    similarity, divided by the total number of those neighbours.
+    """
+    start = time.perf_counter()
+    _, exact_scores = nearest_neighbours(matrix, n_neighbours)
+    exact_seconds = time.perf_counter() - start
+    kth_scores = np.min(np.abs(exact_scores), axis=1, keepdims=True)
+    expected = np.count_nonzero(exact_scores, axis=1)
+
+    results = []
+    for n_tables, n_bits in settings:
+        index = SimHashIndex(n_tables, n_bits, seed)
+        start = time.perf_counter()
+        _, scores = index.nearest_neighbours(matrix, n_neighbours)
+        seconds = time.perf_counter() - start
+        scores = np.abs(scores)
+        # The index returns exact similarities, but allow for rounding in the sums.
+        hits = np.count_nonzero((scores != 0) & (scores >= kth_scores - 1e-12), axis=1)
+        candidates = len(index.candidate_pairs(matrix)[0]) / len(matrix)
+        recall = np.minimum(hits, expected).sum() / max(expected.sum(), 1)
+        results.append((n_tables, n_bits, seconds, candidates, recall))
+    return exact_seconds, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    parallel = subparsers.add_parser("parallel", help="parallel similarity build")
+    parallel.add_argument("--neighbours", type=int, default=None)
+    parallel.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4])
+    lsh = subparsers.add_parser("lsh", help="SimHash candidate index recall")
+    lsh.add_argument("--neighbours", type=int, default=20)
+    lsh.add_argument("--tables", type=int, nargs="+", default=[4, 8, 16])
+    lsh.add_argument("--bits", type=int, nargs="+", default=[6, 8])
+    for subparser in (parallel, lsh):
+        subparser.add_argument("--users", type=int, default=5000)
+        subparser.add_argument("--items", type=int, default=1000)
+        subparser.add_argument("--density", type=float, default=0.05)
+    engine = subparsers.add_parser("engine", help="CollaborativeFiltering phases")
+    engine.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 100000])
+    engine.add_argument("--items", type=int, default=1000)
+    engine.add_argument("--density", type=float, default=0.01)
+    engine.add_argument(
+        "--neighbours",
+        type=int,
+        default=50,
+        help="neighbours kept per user, 0 for the dense similarity matrix",
+    )
+    engine.add_argument("--mode", choices=["user", "item"], default="user")
+    engine.add_argument("--jobs", type=int, default=1)
+    engine.add_argument("--seed", type=int, default=0)
+    engine.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.benchmark == "engine":
+        run_engine_benchmarks(args)
+        return
+
+    matrix = synthetic_ratings_matrix(args.users, args.items, args.density)
+    print(f"{args.users} users x {args.items} items, density {args.density}")
+    if args.benchmark == "parallel":
+        print(f"{'n_jobs':>6} {'seconds':>10} {'speedup':>8}")
+        for n_jobs, seconds, speedup in benchmark_parallel_similarity(
+            matrix, args.jobs, args.neighbours
+        ):
+            print(f"{n_jobs:>6} {seconds:>10.3f} {speedup:>8.2f}")
+    else:
+        settings = [(tables, bits) for tables in args.tables for bits in args.bits]
+        exact_seconds, results = benchmark_candidate_index(
+            matrix, args.neighbours, settings
+        )
+        print(f"exact: {exact_seconds:.3f} seconds")
+        print(
+            f"{'tables':>6} {'bits':>4} {'seconds':>10} {'candidates':>10} "
+            f"{'recall@' + str(args.neighbours):>10}"
+        )
+        for n_tables, n_bits, seconds, candidates, recall in results:
+            print(
+                f"{n_tables:>6} {n_bits:>4} {seconds:>10.3f} {candidates:>10.1f} "
+                f"{recall:>10.3f}"
+            )
+
+
+def run_engine_benchmarks(args):
+    """
+    runs benchmark_engine at every scale in args.users, prints a table of the phases
+    and writes the results with the environment to args.output.
+    """
+    results = []
+    print(f"{'users':>7} {'ratings':>9} {'phase':<17} {'seconds':>9} {'peak MB':>9}")
+    for n_users in args.users:
+        ratings = synthetic_ratings(n_users, args.items, args.density, seed=args.seed)
+        phases = benchmark_engine(
+            ratings,
+            n_neighbours=args.neighbours or None,
+            mode=args.mode,
+            n_jobs=args.jobs,
+        )
+        for phase, result in phases.items():
+            print(
+                f"{n_users:>7} {len(ratings):>9} {phase:<17} "
+                f"{result['seconds']:>9.3f} {result['peak_memory'] / 2**20:>9.1f}"
+            )
+        results.append({"users": n_users, "ratings": len(ratings), "phases": phases})
+    if args.output:
+        settings = {
+            name: getattr(args, name)
+            for name in ("items", "density", "neighbours", "mode", "jobs", "seed")
+        }
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "environment": environment(),
+                    "settings": settings,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import threading
+
+from django.core.cache import caches
+
+# Alias of the cache in settings.CACHES that holds the ranked recommendations.
+CACHE_ALIAS = "recommendations"
+
+# Hits and misses of cached_recommendations in this process.
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def task_key(task_id):
+    return f"recommendations:task:{task_id}"
+
+
+def worker_key(worker_id):
+    return f"recommendations:worker:{worker_id}"
+
+
+def cached_recommendations(key, rank):
+    """
+    returns the ranked list of (id, score) pairs cached under key, or computes it with
+    rank() and caches it if it is missing or has expired, counting the hit or miss.
+    """
+    cache = caches[CACHE_ALIAS]
+    ranking = cache.get(key)
+    with _stats_lock:
+        _stats["hits" if ranking is not None else "misses"] += 1
+    if ranking is None:
+        ranking = rank()
+        cache.set(key, ranking)
+    return ranking
+
+
+def invalidate(task_ids=(), worker_ids=()):
+    """
+    removes the cached recommendations of the tasks and workers.
+    """
+    keys = [task_key(task_id) for task_id in task_ids]
+    keys += [worker_key(worker_id) for worker_id in worker_ids]
+    if keys:
+        caches[CACHE_ALIAS].delete_many(keys)
+
+
+def cache_stats():
+    """
+    returns the hits, misses and hit rate of the recommendations cache in this process.
+    """
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
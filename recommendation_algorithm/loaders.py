@@ -0,0 +1,109 @@
+import itertools
+
+import numpy as np
+from django.db.models import F
+
+from tasks.models import Task
+from users.indexes import CHUNK_SIZE, IndexRegistry
+from users.models import Worker
+
+from .models import Ratings, WorkerSkillset
+from .skill_index import SkillIndex
+
+# Columns of a ratings array, in the (user, item, rating) order CollaborativeFiltering
+# and MatrixFactorization expect.
+RATING_FIELDS = ("customer_id", "worker_id", "rating")
+
+# Process-local skill indexes, loaded on first use and kept up to date by the receivers
+# in signals.py.
+_skill_indexes = IndexRegistry()
+
+
+def rating_querysets():
+    """
+    returns the querysets of (customer_id, worker_id, rating) rows the recommender is
+    built from: every Ratings row, and every Task that has both a worker and a rating.
+
+    Ratings refers to auth.User while Task refers to users.Customer and users.Worker,
+    two tables whose ids overlap, so the ids of Ratings rows are negated to keep the two
+    id spaces apart: -id is the auth.User with that id, id the users.User.
+    """
+    return [
+        Ratings.objects.values_list(-F("customer_id"), -F("worker_id"), "rating"),
+        Task.objects.filter(worker__isnull=False, rating__isnull=False).values_list(
+            *RATING_FIELDS
+        ),
+    ]
+
+
+def load_ratings(querysets=None, chunk_size=CHUNK_SIZE, dtype=np.float64):
+    """
+    returns an n x 3 array of (customer_id, worker_id, rating) rows read from the
+    values_list querysets (rating_querysets() by default), ready to be passed to
+    CollaborativeFiltering or MatrixFactorization.
+
+    The array is preallocated from the row counts and filled chunk_size rows at a time
+    from a server-side iterator, so no model instances are created and only one chunk
+    of Python tuples is alive at any time. Rows added between counting and reading grow
+    the array, rows removed shrink it.
+    """
+    querysets = rating_querysets() if querysets is None else querysets
+    ratings = np.empty((sum(queryset.count() for queryset in querysets), 3), dtype)
+    n_rows = 0
+    for queryset in querysets:
+        rows = queryset.iterator(chunk_size=chunk_size)
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            if n_rows + len(chunk) > len(ratings):
+                size = max(2 * len(ratings), n_rows + len(chunk))
+                ratings = np.resize(ratings, (size, 3))
+            ratings[n_rows : n_rows + len(chunk)] = chunk
+            n_rows += len(chunk)
+    return ratings[:n_rows]
+
+
+def worker_skill_index(load=True):
+    """
+    returns the process-local SkillIndex of the skills, hourly rates and availability of
+    every users.Worker, loading it from the database on first use. With load=False it
+    returns None instead if the index has not been loaded yet.
+    """
+    return _skill_index("worker_skills", _load_worker_skills, load)
+
+
+def worker_skillset_index(load=True):
+    """
+    returns the process-local SkillIndex of the WorkerSkillset skillsets of every worker
+    (user) that has any, loading it from the database on first use. With load=False it
+    returns None instead if the index has not been loaded yet.
+    """
+    return _skill_index("worker_skillsets", _load_worker_skillsets, load)
+
+
+def _skill_index(name, load_index, load):
+    """
+    returns the named skill index, loading it with load_index on first use if load.
+    """
+
+    def load_skill_index():
+        index = SkillIndex()
+        load_index(index)
+        return index
+
+    return _skill_indexes.get(name, load_skill_index, load)
+
+
+def _load_worker_skills(index):
+    index.load(
+        Worker.objects.values_list("id", "hourly_rate", "is_available").iterator(
+            chunk_size=CHUNK_SIZE
+        ),
+        Worker.skills.through.objects.values_list("worker_id", "skill_id").iterator(
+            chunk_size=CHUNK_SIZE
+        ),
+    )
+
+
+def _load_worker_skillsets(index):
+    skillsets = list(WorkerSkillset.objects.values_list("worker_id", "skillset_id"))
+    workers = dict.fromkeys(worker for worker, _ in skillsets)
+    index.load([(worker, None, False) for worker in workers], skillsets)
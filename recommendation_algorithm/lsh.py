@@ -0,0 +1,140 @@
+import numpy as np
+
+from .similarity import MAX_MEMORY, similarity_blocks
+
+
+class SimHashIndex:
+    """
+    A random-projection (SimHash) locality-sensitive hashing index over the mean-centred
+    rating vectors, used to find neighbour candidates without comparing every pair of
+    users. Two users land in the same bucket of a hash table when their vectors fall on
+    the same side of all n_bits random hyperplanes of that table, which is likely when
+    the angle between them, and so their correlation, is high.
+
+    The recall-vs-speed knobs are n_tables and n_bits: more tables find more of the true
+    neighbours at the cost of more candidates, more bits per table give smaller buckets
+    and fewer candidates at the cost of recall.
+    """
+
+    def __init__(self, n_tables=8, n_bits=12, seed=0):
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.seed = seed
+
+    def signatures(self, matrix):
+        """
+        returns a len(matrix) x n_tables array with the bucket of every row in every
+        hash table, and a boolean array marking the rows that can have a non-zero
+        similarity at all (rows whose ratings are not all equal).
+        """
+        mask = matrix != 0
+        counts = np.sum(mask, axis=1, keepdims=True)
+        means = np.divide(
+            np.sum(matrix, axis=1, keepdims=True),
+            counts,
+            out=np.zeros((len(matrix), 1), dtype=matrix.dtype),
+            where=counts != 0,
+        )
+        centred = np.where(mask, matrix - means, 0)
+        active = np.any(np.abs(centred) > 8 * np.finfo(matrix.dtype).eps, axis=1)
+
+        rng = np.random.default_rng(self.seed)
+        planes = rng.standard_normal((matrix.shape[1], self.n_tables * self.n_bits))
+        bits = (centred @ planes.astype(matrix.dtype)) > 0
+        bits = bits.reshape(len(matrix), self.n_tables, self.n_bits)
+        return bits @ (1 << np.arange(self.n_bits, dtype=np.int64)), active
+
+    def bucket_pairs(self, matrix):
+        """
+        yields (rows, columns) pairs of arrays of row indices whose similarities are
+        candidates: the members of every bucket with each other, and the members of
+        every bucket with the members of the bucket on the opposite side of all
+        hyperplanes, which holds the strongly negatively correlated rows.
+        """
+        codes, active = self.signatures(matrix)
+        members = np.flatnonzero(active)
+        opposite_code = (1 << self.n_bits) - 1
+        for table in range(self.n_tables):
+            order = np.argsort(codes[members, table], kind="stable")
+            table_codes, table_members = codes[members[order], table], members[order]
+            boundaries = np.flatnonzero(np.diff(table_codes)) + 1
+            buckets = dict(
+                zip(
+                    table_codes[np.r_[0, boundaries]].tolist(),
+                    np.split(table_members, boundaries),
+                )
+            )
+            for code, bucket in buckets.items():
+                if len(bucket) > 1:
+                    yield bucket, bucket
+                opposite = buckets.get(code ^ opposite_code)
+                if opposite is not None and code < code ^ opposite_code:
+                    yield bucket, opposite
+
+    def candidate_pairs(self, matrix):
+        """
+        returns the (rows, columns) pairs of distinct candidate rows, each pair in both
+        directions and without duplicates.
+        """
+        rows, columns = [], []
+        for bucket_rows, bucket_columns in self.bucket_pairs(matrix):
+            rows += [np.repeat(bucket_rows, len(bucket_columns))]
+            columns += [np.tile(bucket_columns, len(bucket_rows))]
+            if bucket_rows is not bucket_columns:
+                rows += [np.repeat(bucket_columns, len(bucket_rows))]
+                columns += [np.tile(bucket_rows, len(bucket_columns))]
+        if not rows:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        pairs = np.unique(np.concatenate(rows) * len(matrix) + np.concatenate(columns))
+        rows, columns = np.divmod(pairs, len(matrix))
+        distinct = rows != columns
+        return rows[distinct], columns[distinct]
+
+    def nearest_neighbours(self, matrix, n_neighbours, max_memory=MAX_MEMORY):
+        """
+        computes, like similarity.nearest_neighbours, the n_neighbours rows with the
+        strongest (absolute) Pearson similarity to each row of the matrix, but computes
+        the exact similarity only between the rows of each candidate bucket pair, with
+        one matrix product per block. Rows with fewer candidates are padded with
+        zero-score entries pointing at the row itself.
+        """
+        n_neighbours = min(n_neighbours, len(matrix))
+        indices = np.repeat(np.arange(len(matrix))[:, None], n_neighbours, axis=1)
+        scores = np.zeros((len(matrix), n_neighbours), dtype=matrix.dtype)
+
+        rows, columns, similarities = [], [], []
+        for bucket_rows, bucket_columns in self.bucket_pairs(matrix):
+            if bucket_rows is bucket_columns:
+                members = bucket_rows
+            else:
+                members = np.concatenate([bucket_rows, bucket_columns])
+            submatrix = np.asarray(matrix[members])
+            blocks = similarity_blocks(submatrix, max_memory, n_rows=len(bucket_rows))
+            for start, stop, similarity in blocks:
+                if bucket_rows is not bucket_columns:
+                    # The similarity is symmetric, so the block also gives the scores
+                    # of the opposite bucket's rows.
+                    similarity = similarity[:, len(bucket_rows) :]
+                    rows.append(np.repeat(bucket_columns, stop - start))
+                    columns.append(np.tile(bucket_rows[start:stop], len(similarity.T)))
+                    similarities.append(similarity.T.ravel())
+                rows.append(np.repeat(bucket_rows[start:stop], similarity.shape[1]))
+                columns.append(np.tile(bucket_columns, stop - start))
+                similarities.append(similarity.ravel())
+        if not rows:
+            return indices, scores
+
+        rows, columns = np.concatenate(rows), np.concatenate(columns)
+        similarity = np.concatenate(similarities)
+        _, unique = np.unique(rows * len(matrix) + columns, return_index=True)
+        rows, columns, similarity = rows[unique], columns[unique], similarity[unique]
+        keep = rows != columns
+        rows, columns, similarity = rows[keep], columns[keep], similarity[keep]
+
+        order = np.lexsort((-np.abs(similarity), rows))
+        rows, columns, similarity = rows[order], columns[order], similarity[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        keep = rank < n_neighbours
+        indices[rows[keep], rank[keep]] = columns[keep]
+        scores[rows[keep], rank[keep]] = similarity[keep]
+        return indices, scores
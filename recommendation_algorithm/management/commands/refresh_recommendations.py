@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from recommendation_algorithm.refresh import (
+    BATCH_SIZE,
+    TOP_N,
+    refresh_recommendations,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the top-N Recommendation rows of every open task and every worker "
+        "and swaps them in atomically, or with --incremental only those of the tasks "
+        "and workers that changed since the last run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="only recompute the tasks and workers that changed since the last run",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=TOP_N,
+            help="number of recommendations kept per task and per worker",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="number of rows inserted per query",
+        )
+
+    def handle(self, *args, **options):
+        n_tasks, n_workers = refresh_recommendations(
+            incremental=options["incremental"],
+            n=options["top"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Refreshed the recommendations of {n_tasks} tasks and "
+                f"{n_workers} workers."
+            )
+        )
@@ -0,0 +1,53 @@
+# Generated by Django 4.1.7 on 2026-10-16 22:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Skillset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WorkerSkillset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('skillset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recommendation_algorithm.skillset')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='worker_skillset', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_recommendation', to='tasks.task')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='worker_recommendation', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Ratings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.FloatField()),
+                ('review', models.TextField()),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_customer', to=settings.AUTH_USER_MODEL)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tasks.task')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_worker', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
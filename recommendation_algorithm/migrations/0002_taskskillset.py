@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-16 22:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        ('recommendation_algorithm', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSkillset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('skillset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recommendation_algorithm.skillset')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_skillset', to='tasks.task')),
+            ],
+        ),
+    ]
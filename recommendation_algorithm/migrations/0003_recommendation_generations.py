@@ -0,0 +1,50 @@
+# Generated by Django 4.1.7 on 2026-10-16 22:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendation_algorithm', '0002_taskskillset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField(blank=True, null=True)),
+                ('worker_id', models.BigIntegerField(blank=True, null=True)),
+                ('skillset_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecommendationGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('completed_time', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recommendation',
+            name='kind',
+            field=models.CharField(choices=[('worker', 'Worker for a task'), ('task', 'Task for a worker')], default='worker', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='recommendation',
+            name='generation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='recommendation_algorithm.recommendationgeneration'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(fields=['task', 'kind', 'generation', '-score'], name='recommendat_task_id_c42fd8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(fields=['worker', 'kind', 'generation', '-score'], name='recommendat_worker__58a172_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.7 on 2026-10-16 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendation_algorithm', '0003_recommendation_generations'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recommendation',
+            name='recommendat_task_id_c42fd8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recommendation',
+            name='recommendat_worker__58a172_idx',
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(fields=['task', 'kind', 'generation', '-score', 'worker'], name='recommendat_task_id_65b4be_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(fields=['worker', 'kind', 'generation', '-score', 'task'], name='recommendat_worker__f559e9_idx'),
+        ),
+    ]
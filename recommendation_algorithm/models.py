@@ -16,6 +16,13 @@ class WorkerSkillset(models.Model):
     skillset = models.ForeignKey(Skillset, on_delete=models.CASCADE)
 
 
+class TaskSkillset(models.Model):
+    task = models.ForeignKey(
+        "tasks.Task", related_name="task_skillset", on_delete=models.CASCADE
+    )
+    skillset = models.ForeignKey(Skillset, on_delete=models.CASCADE)
+
+
 class Ratings(models.Model):
     rating = models.FloatField()
     review = models.TextField()
@@ -25,20 +32,59 @@ class Ratings(models.Model):
     worker = models.ForeignKey(
         User, related_name="rating_worker", on_delete=models.CASCADE
     )
-    task = models.ForeignKey("Task", on_delete=models.CASCADE)
+    task = models.ForeignKey("tasks.Task", on_delete=models.CASCADE)
 
     def __str__(self):
         return self.review
 
 
+class RecommendationGeneration(models.Model):
+    created_time = models.DateTimeField(auto_now_add=True)
+    completed_time = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Generation {self.id}"
+
+
 class Recommendation(models.Model):
     worker = models.ForeignKey(
         User, related_name="worker_recommendation", on_delete=models.CASCADE
     )
     task = models.ForeignKey(
-        "Task", related_name="task_recommendation", on_delete=models.CASCADE
+        "tasks.Task", related_name="task_recommendation", on_delete=models.CASCADE
     )
     score = models.FloatField()
+    kind = models.CharField(
+        max_length=10,
+        choices=[("worker", "Worker for a task"), ("task", "Task for a worker")],
+        default="worker",
+    )
+    generation = models.ForeignKey(
+        RecommendationGeneration,
+        related_name="recommendations",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["task", "kind", "generation", "-score", "worker"]),
+            models.Index(fields=["worker", "kind", "generation", "-score", "task"]),
+        ]
 
     def __str__(self):
-        return f"{self.worker.username} for task {self.task.name}"
+        return f"{self.worker.username} for task {self.task.title}"
+
+
+class RecommendationChange(models.Model):
+    """
+    A change to the inputs of the recommendations of a task, a worker or everyone with a
+    skillset since the last refresh_recommendations run. The ids are plain integers so
+    that the change outlives the deleted rows it records.
+    """
+
+    task_id = models.BigIntegerField(null=True, blank=True)
+    worker_id = models.BigIntegerField(null=True, blank=True)
+    skillset_id = models.BigIntegerField(null=True, blank=True)
+    created_time = models.DateTimeField(auto_now_add=True)
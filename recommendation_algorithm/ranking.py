@@ -0,0 +1,32 @@
+import numpy as np
+
+
+def top_n(scores, n):
+    """
+    returns the indices of the n highest scores, ordered from highest to lowest with
+    ties broken by index.
+    """
+    if n <= 0:
+        return np.array([], dtype=int)
+    if n < len(scores):
+        indices = np.argpartition(scores, len(scores) - n)[len(scores) - n :]
+    else:
+        indices = np.arange(len(scores))
+    return indices[np.lexsort((indices, -scores[indices]))]
+
+
+def top_n_rows(scores, n):
+    """
+    returns, for every row of scores, the column indices of the n highest scores ordered
+    from highest to lowest with ties broken by index.
+    """
+    n_columns = scores.shape[1]
+    n = max(min(n, n_columns), 0)
+    if n < n_columns:
+        indices = np.argpartition(scores, n_columns - n, axis=1)[:, n_columns - n :]
+    else:
+        indices = np.broadcast_to(np.arange(n_columns), scores.shape).copy()
+    indices.sort(axis=1)
+    top_scores = np.take_along_axis(scores, indices, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return np.take_along_axis(indices, order, axis=1)
@@ -0,0 +1,332 @@
+import itertools
+from collections import defaultdict
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .cache import CACHE_ALIAS, invalidate
+from .loaders import CHUNK_SIZE, worker_skillset_index
+from .models import (
+    Recommendation,
+    RecommendationChange,
+    RecommendationGeneration,
+    TaskSkillset,
+    WorkerSkillset,
+)
+from .skill_index import SkillIndex
+
+# Number of recommendations kept per task and per worker.
+TOP_N = 50
+
+# Number of Recommendation rows inserted per query.
+BATCH_SIZE = 5000
+
+# Number of recommendations per page.
+PAGE_SIZE = 20
+
+# Task statuses that no longer take recommendations.
+CLOSED_STATUSES = ("completed", "rejected")
+
+
+def current_generation():
+    """
+    returns the id of the latest completed RecommendationGeneration, or None before the
+    first refresh.
+    """
+    return (
+        RecommendationGeneration.objects.filter(completed_time__isnull=False)
+        .order_by("-id")
+        .values_list("id", flat=True)
+        .first()
+    )
+
+
+def recommended_workers(task_id, cursor=None, page_size=PAGE_SIZE):
+    """
+    returns a page of the materialized recommendations of workers for a task, as a list
+    of (worker_id, score) pairs in descending order of score, and the cursor of the
+    next page (None on the last page). See recommendation_page.
+    """
+    recommendations = Recommendation.objects.filter(task_id=task_id, kind="worker")
+    return recommendation_page(recommendations, "worker_id", cursor, page_size)
+
+
+def recommended_tasks(worker_id, cursor=None, page_size=PAGE_SIZE):
+    """
+    returns a page of the materialized recommendations of tasks for a worker, as a list
+    of (task_id, score) pairs in descending order of score, and the cursor of the next
+    page (None on the last page). See recommendation_page.
+    """
+    recommendations = Recommendation.objects.filter(worker_id=worker_id, kind="task")
+    return recommendation_page(recommendations, "task_id", cursor, page_size)
+
+
+def recommendation_page(recommendations, id_field, cursor=None, page_size=PAGE_SIZE):
+    """
+    returns the page_size recommendations that follow the cursor, in descending order of
+    score and then ascending id_field, as (id, score) pairs, and the cursor of the next
+    page (None on the last page).
+
+    A cursor is the (generation, score, id) of the last row of the previous page, so a
+    page is one seek on the (task|worker, kind, generation, -score, id) index however
+    deep it is. Pages follow the generation of the first page, so a full refresh in
+    between does not reorder them; once that generation has been deleted, they go on in
+    the current one.
+    """
+    if cursor is None:
+        generation, score, id_ = current_generation(), None, None
+    else:
+        generation, score, id_ = cursor
+        completed = RecommendationGeneration.objects.filter(
+            id=generation, completed_time__isnull=False
+        )
+        if not completed.exists():
+            generation = current_generation()
+
+    recommendations = recommendations.filter(generation_id=generation)
+    if score is not None:
+        recommendations = recommendations.filter(score__lte=score).filter(
+            Q(score__lt=score) | Q(**{"score": score, f"{id_field}__gt": id_})
+        )
+    rows = list(
+        recommendations.order_by("-score", id_field).values_list(id_field, "score")[
+            : page_size + 1
+        ]
+    )
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, (generation, rows[-1][1], rows[-1][0])
+
+
+def encode_cursor(cursor):
+    """
+    returns the cursor of a page as a string for a query parameter.
+    """
+    generation, score, id_ = cursor
+    return f"{generation}:{score!r}:{id_}"
+
+
+def decode_cursor(value):
+    """
+    returns the cursor encoded by encode_cursor, raising ValueError if value is not one.
+    """
+    generation, score, id_ = value.split(":")
+    return int(generation), float(score), int(id_)
+
+
+def refresh_recommendations(incremental=False, n=TOP_N, batch_size=BATCH_SIZE):
+    """
+    computes the top n recommended workers of the open tasks and the top n recommended
+    tasks of the workers, and returns how many tasks and workers were recomputed.
+
+    A full refresh recomputes everything into a new generation and then, in one
+    transaction, marks it as current and deletes the generations before the previous
+    one, so readers switch from one complete set of rows to the next. An incremental
+    refresh recomputes only the tasks and workers affected by the RecommendationChange
+    rows recorded since the last run, and swaps in a new generation the same way, with
+    the rows of the other tasks and workers copied forward from the current one. Without
+    a current generation it does a full refresh.
+    """
+    last_change = RecommendationChange.objects.aggregate(last=Max("id"))["last"] or 0
+    generation = current_generation()
+    if incremental and generation is not None:
+        return _refresh_changed(generation, last_change, n, batch_size)
+    return _refresh_all(last_change, n, batch_size)
+
+
+def changed_tasks_and_workers(last_change):
+    """
+    returns the ids of the tasks and of the workers whose recommendations are affected
+    by the RecommendationChange rows up to last_change:
+    - a changed task, and the workers with any of its skillsets;
+    - a task whose skillset changed, and the workers with that skillset;
+    - a worker whose skillset changed, and the tasks requiring that skillset.
+    """
+    task_ids, worker_ids = set(), set()
+    tasks, task_skillsets, worker_skillsets = set(), set(), set()
+    changes = RecommendationChange.objects.filter(id__lte=last_change).values_list(
+        "task_id", "worker_id", "skillset_id"
+    )
+    for task_id, worker_id, skillset_id in changes:
+        if task_id is not None:
+            task_ids.add(task_id)
+            if skillset_id is None:
+                tasks.add(task_id)
+            else:
+                task_skillsets.add(skillset_id)
+        if worker_id is not None:
+            worker_ids.add(worker_id)
+            worker_skillsets.add(skillset_id)
+
+    worker_skillsets.discard(None)
+    changed_task_skillsets = TaskSkillset.objects.filter(task_id__in=tasks)
+    worker_ids.update(
+        WorkerSkillset.objects.filter(
+            Q(skillset_id__in=task_skillsets)
+            | Q(skillset_id__in=changed_task_skillsets.values("skillset_id"))
+        ).values_list("worker_id", flat=True)
+    )
+    task_ids.update(
+        TaskSkillset.objects.filter(skillset_id__in=worker_skillsets).values_list(
+            "task_id", flat=True
+        )
+    )
+    return task_ids, worker_ids
+
+
+def _refresh_all(last_change, n, batch_size):
+    """
+    recomputes the recommendations of every open task and every worker into a new
+    generation and swaps it in.
+    """
+    task_skillsets = _task_skillsets()
+    worker_skillsets = _worker_skillsets()
+    previous_generation = current_generation()
+    generation = RecommendationGeneration.objects.create()
+    worker_index = _skill_index(worker_skillsets)
+    task_index = _skill_index(task_skillsets)
+    rows = _recommendations(task_skillsets, worker_index, "worker", n, generation.id)
+    rows += _recommendations(worker_skillsets, task_index, "task", n, generation.id)
+
+    # The rows are invisible to readers until the generation is completed.
+    Recommendation.objects.bulk_create(rows, batch_size=batch_size)
+    _complete_generation(
+        generation, previous_generation, last_change, caches[CACHE_ALIAS].clear
+    )
+    return len(task_skillsets), len(worker_skillsets)
+
+
+def _refresh_changed(previous_generation, last_change, n, batch_size):
+    """
+    recomputes the recommendations of the changed tasks and workers into a new
+    generation, copies the rows of the other tasks and workers into it from
+    previous_generation and swaps it in. Changed tasks that are closed or deleted lose
+    their rows.
+    """
+    task_ids, worker_ids = changed_tasks_and_workers(last_change)
+    task_skillsets = _task_skillsets(task_ids)
+    worker_skillsets = _worker_skillsets(worker_ids)
+    generation = RecommendationGeneration.objects.create()
+    rows = _recommendations(
+        task_skillsets, worker_skillset_index(), "worker", n, generation.id
+    )
+    if worker_skillsets:
+        task_index = _skill_index(_task_skillsets())
+        rows += _recommendations(worker_skillsets, task_index, "task", n, generation.id)
+
+    # The rows are invisible to readers until the generation is completed, and the
+    # rows of previous_generation are left alone for the pages being read from it.
+    Recommendation.objects.bulk_create(rows, batch_size=batch_size)
+    unchanged = (
+        Recommendation.objects.filter(generation_id=previous_generation)
+        .exclude(kind="worker", task_id__in=task_ids)
+        .exclude(kind="task", worker_id__in=worker_ids)
+        .values_list("worker_id", "task_id", "score", "kind")
+        .iterator(chunk_size=batch_size)
+    )
+    while chunk := list(itertools.islice(unchanged, batch_size)):
+        Recommendation.objects.bulk_create(
+            [
+                Recommendation(
+                    worker_id=worker_id,
+                    task_id=task_id,
+                    score=score,
+                    kind=kind,
+                    generation_id=generation.id,
+                )
+                for worker_id, task_id, score, kind in chunk
+            ]
+        )
+    _complete_generation(
+        generation,
+        previous_generation,
+        last_change,
+        lambda: invalidate(task_ids, worker_ids),
+    )
+    return len(task_ids), len(worker_ids)
+
+
+def _complete_generation(generation, previous_generation, last_change, invalidate):
+    """
+    marks the generation as current, deletes the generations before
+    previous_generation and the RecommendationChange rows up to last_change, and calls
+    invalidate once that is committed.
+    """
+    with transaction.atomic():
+        generation.completed_time = timezone.now()
+        generation.save(update_fields=["completed_time"])
+        # The previous generation is kept for the pages already being read from it.
+        RecommendationGeneration.objects.exclude(
+            id__in=[generation.id, previous_generation]
+        ).delete()
+        Recommendation.objects.filter(generation__isnull=True).delete()
+        RecommendationChange.objects.filter(id__lte=last_change).delete()
+        transaction.on_commit(invalidate)
+
+
+def _task_skillsets(task_ids=None):
+    """
+    returns a dict mapping each open task (of task_ids, if given) with skillsets to the
+    set of its skillsets.
+    """
+    queryset = TaskSkillset.objects.exclude(task__status__in=CLOSED_STATUSES)
+    if task_ids is not None:
+        queryset = queryset.filter(task_id__in=task_ids)
+    return _skillsets(queryset.values_list("task_id", "skillset_id"))
+
+
+def _worker_skillsets(worker_ids=None):
+    """
+    returns a dict mapping each worker (of worker_ids, if given) with skillsets to the
+    set of its skillsets.
+    """
+    queryset = WorkerSkillset.objects.all()
+    if worker_ids is not None:
+        queryset = queryset.filter(worker_id__in=worker_ids)
+    return _skillsets(queryset.values_list("worker_id", "skillset_id"))
+
+
+def _skillsets(rows):
+    skillsets = defaultdict(set)
+    for id_, skillset_id in rows.iterator(chunk_size=CHUNK_SIZE):
+        skillsets[id_].add(skillset_id)
+    return skillsets
+
+
+def _skill_index(skillsets):
+    """
+    returns a SkillIndex with a row for every key of skillsets.
+    """
+    index = SkillIndex()
+    index.load(
+        [(id_, None, True) for id_ in skillsets],
+        [(id_, skillset) for id_, ids in skillsets.items() for skillset in ids],
+    )
+    return index
+
+
+def _recommendations(skillsets, index, kind, n, generation):
+    """
+    returns the Recommendation rows of the n best matches in the index of every entry of
+    skillsets, scored by the fraction of the entry's skillsets they have. With
+    kind="worker" the entries are tasks and the index holds workers, with kind="task"
+    it is the other way around.
+    """
+    rows = []
+    for id_, ids in skillsets.items():
+        matches, matched = index.match(ids)
+        for match, count in zip(matches[:n].tolist(), matched[:n].tolist()):
+            task_id, worker_id = (id_, match) if kind == "worker" else (match, id_)
+            rows.append(
+                Recommendation(
+                    worker_id=worker_id,
+                    task_id=task_id,
+                    score=count / len(ids),
+                    kind=kind,
+                    generation_id=generation,
+                )
+            )
+    return rows
@@ -0,0 +1,144 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from tasks.models import Task
+from users.indexes import on_commit_if_loaded
+from users.models import Skill, Worker
+
+from .cache import invalidate
+from .loaders import worker_skill_index, worker_skillset_index
+from .models import RecommendationChange, TaskSkillset, WorkerSkillset
+
+
+@receiver(post_save, sender=Worker)
+def update_worker_in_skill_index(sender, instance, **kwargs):
+    """
+    updates the hourly rate and availability of a saved worker in the skill index.
+    """
+    on_commit_if_loaded(
+        worker_skill_index,
+        lambda index: index.set_worker(
+            instance.pk,
+            hourly_rate=instance.hourly_rate,
+            is_available=instance.is_available,
+        ),
+    )
+
+
+@receiver(post_delete, sender=Worker)
+def remove_worker_from_skill_index(sender, instance, **kwargs):
+    pk = instance.pk
+    on_commit_if_loaded(worker_skill_index, lambda index: index.remove_worker(pk))
+
+
+@receiver(post_delete, sender=Skill)
+def remove_skill_from_skill_index(sender, instance, **kwargs):
+    pk = instance.pk
+    on_commit_if_loaded(
+        worker_skill_index, lambda index: index.remove_skills(None, [pk])
+    )
+
+
+@receiver(m2m_changed, sender=Worker.skills.through)
+def update_skills_in_skill_index(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    applies skills added to or removed from workers, from either side of the relation,
+    to the skill index.
+    """
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        workers, skills = pk_set, [instance.pk]
+    else:
+        workers, skills = [instance.pk], pk_set
+
+    def update(index):
+        if action == "post_add":
+            index.add_skills(workers, skills)
+        elif action == "post_remove":
+            index.remove_skills(workers, skills)
+        elif reverse:
+            index.remove_skills(None, skills)
+        else:
+            index.set_worker(instance.pk, skill_ids=[])
+
+    on_commit_if_loaded(worker_skill_index, update)
+
+
+@receiver(post_save, sender=WorkerSkillset)
+@receiver(post_delete, sender=WorkerSkillset)
+def update_worker_skillsets_in_skill_index(sender, instance, **kwargs):
+    """
+    reloads the skillsets of the worker of a saved or deleted WorkerSkillset in the
+    skillset index.
+    """
+    on_commit_if_loaded(
+        worker_skillset_index,
+        lambda index: index.set_worker(
+            instance.worker_id,
+            skill_ids=WorkerSkillset.objects.filter(
+                worker_id=instance.worker_id
+            ).values_list("skillset_id", flat=True),
+        ),
+    )
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_recommendations(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate(task_ids=[pk]))
+
+
+@receiver(post_save, sender=TaskSkillset)
+@receiver(post_delete, sender=TaskSkillset)
+def invalidate_task_skillset_recommendations(sender, instance, **kwargs):
+    """
+    invalidates the cached recommendations of a task whose skillsets changed, and of
+    the workers with the skillset, whose recommended tasks may change.
+    """
+    workers = WorkerSkillset.objects.filter(skillset_id=instance.skillset_id)
+    transaction.on_commit(
+        lambda: invalidate(
+            task_ids=[instance.task_id],
+            worker_ids=workers.values_list("worker_id", flat=True),
+        )
+    )
+
+
+@receiver(post_save, sender=WorkerSkillset)
+@receiver(post_delete, sender=WorkerSkillset)
+def invalidate_worker_skillset_recommendations(sender, instance, **kwargs):
+    """
+    invalidates the cached recommendations of a worker whose skillsets changed, and of
+    the tasks requiring the skillset, whose recommended workers may change.
+    """
+    tasks = TaskSkillset.objects.filter(skillset_id=instance.skillset_id)
+    transaction.on_commit(
+        lambda: invalidate(
+            task_ids=tasks.values_list("task_id", flat=True),
+            worker_ids=[instance.worker_id],
+        )
+    )
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def record_task_change(sender, instance, **kwargs):
+    RecommendationChange.objects.create(task_id=instance.pk)
+
+
+@receiver(post_save, sender=TaskSkillset)
+@receiver(post_delete, sender=TaskSkillset)
+def record_task_skillset_change(sender, instance, **kwargs):
+    RecommendationChange.objects.create(
+        task_id=instance.task_id, skillset_id=instance.skillset_id
+    )
+
+
+@receiver(post_save, sender=WorkerSkillset)
+@receiver(post_delete, sender=WorkerSkillset)
+def record_worker_skillset_change(sender, instance, **kwargs):
+    RecommendationChange.objects.create(
+        worker_id=instance.worker_id, skillset_id=instance.skillset_id
+    )
@@ -0,0 +1,220 @@
+import functools
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Default ceiling, in bytes, on the intermediate arrays of one block of rows while
+# building the similarity structure. The structure itself is not included.
+MAX_MEMORY = 256 * 1024 * 1024
+
+# Number of block x len(matrix) arrays of the dtype of the matrix that computing and
+# reducing a block keeps alive at its peak: the six sums, one temporary and the masks
+# of _pearson, which are counted as one array although they take a byte per entry.
+_ARRAYS_PER_BLOCK = 8
+
+# Memory-mapped inputs of the worker processes of a parallel build.
+_shared_arrays = {}
+
+
+def pearson_similarity(matrix, start=0, stop=None):
+    """
+    computes the Pearson correlation coefficient between rows start:stop of the matrix
+    and every row of the matrix, using only the columns that both rows have rated
+    (non-zero entries). All pairs are computed at once from masked matrix products of
+    the co-rated counts, sums, sums of squares and cross products.
+
+    Pairs without common items, pairs where either side has no variance over the
+    common items and the diagonal get a similarity of 0. The result has the dtype of
+    the matrix.
+    """
+    mask = (matrix != 0).astype(matrix.dtype)
+    return _pearson_similarity(matrix, mask, matrix * matrix, start, stop)
+
+
+def _pearson_similarity(matrix, mask, squares, start=0, stop=None):
+    """
+    pearson_similarity with the mask and the squares of the matrix computed once by the
+    caller, so that building the structure block by block does not recompute them.
+    """
+    stop = len(matrix) if stop is None else stop
+    block = matrix[start:stop]
+    block_mask = mask[start:stop]
+
+    counts = block_mask @ mask.T
+    sum_x = block @ mask.T
+    sum_y = block_mask @ matrix.T
+    sum_xx = squares[start:stop] @ mask.T
+    sum_yy = block_mask @ squares.T
+    sum_xy = block @ matrix.T
+
+    similarity = _pearson(counts, sum_x, sum_y, sum_xx, sum_yy, sum_xy)
+    rows = np.arange(stop - start)
+    similarity[rows, rows + start] = 0
+    return similarity
+
+
+def _pearson(counts, sum_x, sum_y, sum_xx, sum_yy, sum_xy):
+    """
+    computes the Pearson correlation coefficient from the co-rated counts, sums, sums
+    of squares and cross products, with 0 wherever it is undefined. The sums are
+    overwritten: the result is computed in place in sum_xy, with one more temporary
+    array, so that a block holds at most _ARRAYS_PER_BLOCK arrays at once.
+    """
+    # Rounding can leave a tiny positive variance for constant ratings, so anything
+    # within a few ulps of the sum of squares counts as no variance at all.
+    tolerance = 8 * np.finfo(sum_xx.dtype).eps
+    defined = counts > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        product = sum_x * sum_y
+        product /= counts
+        covariance = np.subtract(sum_xy, product, out=sum_xy)
+
+        np.multiply(sum_x, sum_x, out=product)
+        product /= counts
+        variance_x = np.subtract(sum_xx, product, out=product)
+        sum_xx *= tolerance
+        defined &= variance_x > sum_xx
+
+        np.multiply(sum_y, sum_y, out=sum_x)
+        sum_x /= counts
+        variance_y = np.subtract(sum_yy, sum_x, out=sum_x)
+        sum_yy *= tolerance
+        defined &= variance_y > sum_yy
+
+        variance_x *= variance_y
+        similarity = np.divide(
+            covariance, np.sqrt(variance_x, out=variance_x), out=covariance
+        )
+    np.clip(similarity, -1, 1, out=similarity)
+    similarity[~defined] = 0
+    return similarity
+
+
+def similarity_blocks(
+    matrix, max_memory=MAX_MEMORY, n_jobs=1, reduce=None, n_rows=None
+):
+    """
+    yields (start, stop, similarity) for consecutive blocks of rows of the Pearson
+    similarity matrix of the matrix, or of its first n_rows rows only. The number of
+    rows per block is chosen so that the intermediate arrays of all blocks in flight
+    stay under max_memory bytes. If reduce is given, reduce(similarity) is yielded
+    instead of the block.
+
+    With n_jobs > 1 (or -1 for all CPUs) the blocks are computed by a pool of worker
+    processes. The matrix, its mask and its squares are written once to temporary
+    .npy files that the workers memory-map instead of receiving pickled copies, and
+    reduce runs in the workers so only its result is sent back.
+    """
+    if n_jobs != -1 and n_jobs < 1:
+        raise ValueError(f"n_jobs must be a positive number or -1, not {n_jobs!r}")
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    n_rows = len(matrix) if n_rows is None else n_rows
+    block_size = block_rows(matrix, max_memory / n_jobs)
+    if n_jobs > 1:
+        block_size = min(block_size, -(-n_rows // n_jobs))
+    starts = range(0, n_rows, block_size)
+    stops = [min(start + block_size, n_rows) for start in starts]
+    arrays = {
+        "matrix": matrix,
+        "mask": (matrix != 0).astype(matrix.dtype),
+        "squares": matrix * matrix,
+    }
+    if n_jobs == 1:
+        for start, stop in zip(starts, stops):
+            yield start, stop, _similarity_block(arrays, start, stop, reduce)
+        return
+
+    with tempfile.TemporaryDirectory() as path:
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        del arrays
+        with ProcessPoolExecutor(
+            n_jobs, initializer=_load_shared_arrays, initargs=(path,)
+        ) as executor:
+            blocks = executor.map(
+                _shared_similarity_block, starts, stops, [reduce] * len(starts)
+            )
+            yield from zip(starts, stops, blocks)
+
+
+def _load_shared_arrays(path):
+    """
+    memory-maps the inputs of a parallel build in a worker process.
+    """
+    for name in ("matrix", "mask", "squares"):
+        _shared_arrays[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+
+def _shared_similarity_block(start, stop, reduce=None):
+    """
+    computes rows start:stop of the similarity matrix in a worker process.
+    """
+    return _similarity_block(_shared_arrays, start, stop, reduce)
+
+
+def _similarity_block(arrays, start, stop, reduce=None):
+    """
+    computes rows start:stop of the similarity matrix from the matrix, its mask and
+    its squares.
+    """
+    similarity = _pearson_similarity(
+        arrays["matrix"], arrays["mask"], arrays["squares"], start, stop
+    )
+    return similarity if reduce is None else reduce(similarity)
+
+
+def block_rows(matrix, max_memory=MAX_MEMORY):
+    """
+    returns how many rows of the similarity matrix of the matrix can be computed at
+    once without the intermediate arrays exceeding max_memory bytes (at least one).
+    """
+    row_bytes = _ARRAYS_PER_BLOCK * max(len(matrix), 1) * matrix.dtype.itemsize
+    return max(int(max_memory // row_bytes), 1)
+
+
+def similarity_matrix(matrix, max_memory=MAX_MEMORY, n_jobs=1):
+    """
+    computes the dense Pearson similarity matrix of the rows of the matrix, writing
+    each block of rows straight into the result.
+    """
+    similarity = np.empty((len(matrix), len(matrix)), dtype=matrix.dtype)
+    for start, stop, block in similarity_blocks(matrix, max_memory, n_jobs):
+        similarity[start:stop] = block
+    return similarity
+
+
+def nearest_neighbours(matrix, n_neighbours, max_memory=MAX_MEMORY, n_jobs=1):
+    """
+    computes the n_neighbours rows with the strongest (absolute) Pearson similarity to
+    each row of the matrix, one block of rows at a time so the full similarity matrix
+    is never held in memory. Returns two len(matrix) x n_neighbours arrays holding the
+    neighbour indices and the similarity scores. Rows with fewer non-zero similarities
+    are padded with zero-score neighbours, which do not contribute to predictions.
+    """
+    n_neighbours = min(n_neighbours, len(matrix))
+    indices = np.zeros((len(matrix), n_neighbours), dtype=np.intp)
+    scores = np.zeros((len(matrix), n_neighbours), dtype=matrix.dtype)
+    reduce = functools.partial(top_neighbours, n_neighbours=n_neighbours)
+    blocks = similarity_blocks(matrix, max_memory, n_jobs, reduce)
+    for start, stop, (block_indices, block_scores) in blocks:
+        indices[start:stop], scores[start:stop] = block_indices, block_scores
+    return indices, scores
+
+
+def top_neighbours(similarity, n_neighbours):
+    """
+    returns the column indices and values of the n_neighbours entries with the largest
+    absolute value in every row of a block of the similarity matrix.
+    """
+    n_columns = similarity.shape[1]
+    if n_neighbours < n_columns:
+        strength = np.abs(similarity)
+        np.negative(strength, out=strength)
+        indices = np.argpartition(strength, n_neighbours - 1, axis=1)
+        # Copy the first columns, so that the rest of the partition can be freed.
+        indices = indices[:, :n_neighbours].copy()
+    else:
+        indices = np.broadcast_to(np.arange(n_columns), similarity.shape).copy()
+    return indices, np.take_along_axis(similarity, indices, axis=1)
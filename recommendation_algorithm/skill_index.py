@@ -0,0 +1,208 @@
+import threading
+
+import numpy as np
+
+# Number of skills packed into each mask word.
+WORD_BITS = 64
+
+# Number of set bits of every byte, for NumPy versions without np.bitwise_count.
+_BYTE_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+def popcount(words):
+    """
+    returns the number of set bits of every uint64 word.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    words = np.ascontiguousarray(words)
+    bytes_ = words.view(np.uint8).reshape(*words.shape, 8)
+    return _BYTE_POPCOUNT[bytes_].sum(axis=-1, dtype=np.uint8)
+
+
+class SkillIndex:
+    """
+    A process-local index of the skills of every worker, held as one packed bitmask of
+    uint64 words per worker, with the hourly rates and availability of the workers in
+    parallel arrays. Matching a set of skills against all workers is one vectorized
+    AND and popcount over the masks, without touching the database.
+
+    Each skill id is given the next free bit the first time it is seen, and a mask word
+    is added to every row when the bits run out. A removed worker's row is replaced by
+    the last row.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.load([], [])
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, worker_id):
+        return worker_id in self.rows
+
+    def load(self, workers, skills):
+        """
+        replaces the contents of the index with the workers, given as (worker_id,
+        hourly_rate, is_available) rows, and their skills, given as (worker_id,
+        skill_id) rows. Skills of workers that are not in workers are ignored.
+        """
+        workers = list(workers)
+        with self.lock:
+            self.worker_ids = np.array([row[0] for row in workers], dtype=np.int64)
+            self.hourly_rates = np.array(
+                [np.nan if row[1] is None else row[1] for row in workers], dtype=float
+            )
+            self.available = np.array([bool(row[2]) for row in workers], dtype=bool)
+            self.masks = np.zeros((len(workers), 1), dtype=np.uint64)
+            worker_ids = self.worker_ids.tolist()
+            self.rows = {worker: row for row, worker in enumerate(worker_ids)}
+            self.skill_bits = {}
+
+            skills = [(worker, skill) for worker, skill in skills if worker in self]
+            rows = np.array([self.rows[worker] for worker, _ in skills], dtype=np.intp)
+            bits = self._bits([skill for _, skill in skills])
+            words, bits = np.divmod(bits, WORD_BITS)
+            np.bitwise_or.at(self.masks, (rows, words), _word_bits(bits))
+
+    def set_worker(
+        self, worker_id, skill_ids=None, hourly_rate=None, is_available=None
+    ):
+        """
+        adds a worker to the index, or updates it, replacing its skills, hourly rate and
+        availability by those given. Arguments left at None are not changed; a new
+        worker starts without skills or hourly rate and unavailable.
+        """
+        with self.lock:
+            row = self.rows.get(worker_id)
+            if row is None:
+                row = self._add_row(worker_id)
+            if skill_ids is not None:
+                self.masks[row] = 0
+                self._set_bits([row], skill_ids, True)
+            if hourly_rate is not None:
+                self.hourly_rates[row] = hourly_rate
+            if is_available is not None:
+                self.available[row] = is_available
+
+    def remove_worker(self, worker_id):
+        """
+        removes a worker from the index, moving the last row into its place.
+        """
+        with self.lock:
+            row = self.rows.pop(worker_id, None)
+            if row is None:
+                return
+            last = len(self.rows)
+            arrays = ("worker_ids", "masks", "hourly_rates", "available")
+            for name in arrays:
+                array = getattr(self, name)
+                array[row] = array[last]
+                setattr(self, name, array[:last])
+            if row != last:
+                self.rows[int(self.worker_ids[row])] = row
+
+    def add_skills(self, worker_ids, skill_ids):
+        """
+        adds the skills to the workers in the index, or to every worker if worker_ids is
+        None.
+        """
+        with self.lock:
+            self._set_bits(self._worker_rows(worker_ids), skill_ids, True)
+
+    def remove_skills(self, worker_ids, skill_ids):
+        """
+        removes the skills from the workers in the index, or from every worker if
+        worker_ids is None.
+        """
+        with self.lock:
+            self._set_bits(self._worker_rows(worker_ids), skill_ids, False)
+
+    def skill_mask(self, skill_ids):
+        """
+        returns the packed mask of the skills, leaving out skills no worker has.
+        """
+        with self.lock:
+            bits = [self.skill_bits[s] for s in skill_ids if s in self.skill_bits]
+            mask = np.zeros(self.masks.shape[1], dtype=np.uint64)
+        words, bits = np.divmod(np.array(bits, dtype=np.int64), WORD_BITS)
+        np.bitwise_or.at(mask, words, _word_bits(bits))
+        return mask
+
+    def match(self, skill_ids, max_hourly_rate=None, available=None):
+        """
+        returns the ids of the workers with at least one of the skills and how many of
+        the skills each of them has, ordered by that number (highest first) and then by
+        worker id; if skill_ids is None every worker matches, with no skills. With
+        max_hourly_rate only workers with an hourly rate of at most max_hourly_rate are
+        returned, and with available only workers whose availability equals available.
+        """
+        with self.lock:
+            if skill_ids is None:
+                matched = np.zeros(len(self.rows), dtype=np.int64)
+                selected = np.ones(len(self.rows), dtype=bool)
+            else:
+                mask = self.skill_mask(skill_ids)
+                matched = popcount(self.masks & mask).sum(axis=1, dtype=np.int64)
+                selected = matched > 0
+            if max_hourly_rate is not None:
+                selected &= self.hourly_rates <= max_hourly_rate
+            if available is not None:
+                selected &= self.available == available
+            worker_ids, matched = self.worker_ids[selected], matched[selected]
+        order = np.lexsort((worker_ids, -matched))
+        return worker_ids[order], matched[order]
+
+    def _add_row(self, worker_id):
+        """
+        appends an empty row for a worker and returns its index.
+        """
+        row = len(self.rows)
+        self.rows[worker_id] = row
+        self.worker_ids = np.append(self.worker_ids, worker_id)
+        self.masks = np.pad(self.masks, ((0, 1), (0, 0)))
+        self.hourly_rates = np.append(self.hourly_rates, np.nan)
+        self.available = np.append(self.available, False)
+        return row
+
+    def _worker_rows(self, worker_ids):
+        """
+        returns the rows of the workers that are in the index, or of every worker if
+        worker_ids is None.
+        """
+        if worker_ids is None:
+            return np.arange(len(self.rows))
+        rows = [self.rows[worker] for worker in worker_ids if worker in self.rows]
+        return np.array(rows, dtype=np.intp)
+
+    def _bits(self, skill_ids):
+        """
+        returns the bits of the skills, giving new skills the next free bits and adding
+        mask words when they run out.
+        """
+        for skill in skill_ids:
+            self.skill_bits.setdefault(skill, len(self.skill_bits))
+        n_words = max(-(-len(self.skill_bits) // WORD_BITS), 1)
+        if n_words > self.masks.shape[1]:
+            padding = ((0, 0), (0, n_words - self.masks.shape[1]))
+            self.masks = np.pad(self.masks, padding)
+        return np.array([self.skill_bits[skill] for skill in skill_ids], dtype=np.int64)
+
+    def _set_bits(self, rows, skill_ids, value):
+        """
+        sets the bits of the skills in the given rows, or clears them if not value.
+        """
+        skill_ids = list(skill_ids)
+        if value:
+            self._bits(skill_ids)
+            self.masks[rows] |= self.skill_mask(skill_ids)
+        else:
+            self.masks[rows] &= ~self.skill_mask(skill_ids)
+
+
+def _word_bits(bits):
+    """
+    returns uint64 words with the given bit set.
+    """
+    return np.left_shift(np.uint64(1), bits.astype(np.uint64))
@@ -1,3 +1,964 @@
-from django.test import TestCase
+import functools
+import json
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+import warnings
+from io import StringIO
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from tasks.models import Task
+from users.models import Customer, Skill, Worker
+
+from .CollaborativeFiltering import CollaborativeFiltering
+from .benchmarks import (
+    benchmark_candidate_index,
+    benchmark_engine,
+    synthetic_ratings,
+)
+from .MatrixFactorization import MatrixFactorization
+from . import loaders
+from .cache import (
+    CACHE_ALIAS,
+    cache_stats,
+    cached_recommendations,
+    reset_cache_stats,
+    task_key,
+    worker_key,
+)
+from .loaders import load_ratings, worker_skill_index
+from .lsh import SimHashIndex
+from .models import (
+    Ratings,
+    Recommendation,
+    RecommendationGeneration,
+    Skillset,
+    TaskSkillset,
+    WorkerSkillset,
+)
+from .refresh import (
+    decode_cursor,
+    encode_cursor,
+    recommended_tasks,
+    recommended_workers,
+)
+from .similarity import (
+    _similarity_block,
+    block_rows,
+    nearest_neighbours,
+    pearson_similarity,
+    similarity_matrix,
+    top_neighbours,
+)
+from .skill_index import SkillIndex
+from .views import recommend_task, recommend_worker
+
+
+def pairwise_pearson_similarity(matrix):
+    """
+    the original per-pair loop, used as the reference for the vectorized engine.
+    """
+    similarity_matrix = np.zeros((len(matrix), len(matrix)))
+    for i in range(len(matrix)):
+        for j in range(len(matrix)):
+            if i != j:
+                common_items = np.logical_and(matrix[i, :] != 0, matrix[j, :] != 0)
+                if np.sum(common_items) > 0:
+                    with warnings.catch_warnings():
+                        warnings.simplefilter("ignore", RuntimeWarning)
+                        similarity = np.corrcoef(
+                            matrix[i, common_items], matrix[j, common_items]
+                        )[0, 1]
+                    similarity_matrix[i, j] = similarity
+    # np.corrcoef is undefined when either side has no variance over the common items
+    return np.nan_to_num(similarity_matrix)
+
+
+def random_ratings_matrix(n_users, n_items, density, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = rng.integers(1, 6, size=(n_users, n_items)).astype(float)
+    matrix[rng.random((n_users, n_items)) > density] = 0
+    return matrix
+
+
+def random_ratings(n_users, n_items, n_ratings, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack(
+        [
+            rng.integers(0, n_users, n_ratings),
+            rng.integers(0, n_items, n_ratings) + 1000,
+            rng.integers(1, 6, n_ratings),
+        ]
+    ).astype(float)
+
+
+class PearsonSimilarityTests(SimpleTestCase):
+    def test_matches_pairwise_loop(self):
+        for seed, density in enumerate([0.1, 0.3, 0.8]):
+            matrix = random_ratings_matrix(40, 25, density, seed=seed)
+            np.testing.assert_allclose(
+                pearson_similarity(matrix),
+                pairwise_pearson_similarity(matrix),
+                atol=1e-10,
+            )
+
+    def test_row_block_matches_full_matrix(self):
+        matrix = random_ratings_matrix(30, 20, 0.4)
+        full = pearson_similarity(matrix)
+        np.testing.assert_allclose(pearson_similarity(matrix, 10, 20), full[10:20])
+
+    def test_small_memory_ceiling_matches_single_block(self):
+        matrix = random_ratings_matrix(30, 20, 0.4)
+        row_bytes = 12 * len(matrix) * matrix.dtype.itemsize
+        np.testing.assert_allclose(
+            similarity_matrix(matrix, max_memory=7 * row_bytes),
+            pearson_similarity(matrix),
+        )
+        _, scores = nearest_neighbours(matrix, 5, max_memory=1)
+        _, expected_scores = nearest_neighbours(matrix, 5)
+        np.testing.assert_allclose(scores, expected_scores)
+
+    def test_blocks_stay_under_memory_ceiling(self):
+        for dtype in [np.float64, np.float32]:
+            matrix = random_ratings_matrix(3000, 100, 0.1).astype(dtype)
+            arrays = {
+                "matrix": matrix,
+                "mask": (matrix != 0).astype(dtype),
+                "squares": matrix * matrix,
+            }
+            max_memory = 16 * 1024 * 1024
+            stop = block_rows(matrix, max_memory)
+            reduce = functools.partial(top_neighbours, n_neighbours=20)
+            tracemalloc.start()
+            try:
+                _similarity_block(arrays, 0, stop, reduce)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            self.assertLessEqual(peak, max_memory)
+
+    def test_parallel_build_matches_serial(self):
+        matrix = random_ratings_matrix(40, 25, 0.3)
+        np.testing.assert_array_equal(
+            similarity_matrix(matrix, n_jobs=2), similarity_matrix(matrix)
+        )
+        indices, scores = nearest_neighbours(matrix, 5, n_jobs=2)
+        expected_indices, expected_scores = nearest_neighbours(matrix, 5)
+        np.testing.assert_array_equal(indices, expected_indices)
+        np.testing.assert_array_equal(scores, expected_scores)
+
+    def test_invalid_n_jobs_is_rejected(self):
+        matrix = random_ratings_matrix(10, 5, 0.5)
+        for n_jobs in [0, -2]:
+            with self.assertRaises(ValueError):
+                similarity_matrix(matrix, n_jobs=n_jobs)
+            with self.assertRaises(ValueError):
+                CollaborativeFiltering(random_ratings(10, 5, 20), n_jobs=n_jobs)
+
+    def test_diagonal_and_disjoint_users_are_zero(self):
+        matrix = np.array(
+            [[5.0, 3.0, 0.0, 0.0], [0.0, 0.0, 4.0, 1.0], [4.0, 2.0, 0.0, 0.0]]
+        )
+        similarity = pearson_similarity(matrix)
+        np.testing.assert_array_equal(np.diag(similarity), 0)
+        self.assertEqual(similarity[0, 1], 0)
+        self.assertAlmostEqual(similarity[0, 2], 1.0)
+
+
+class SimHashIndexTests(SimpleTestCase):
+    def test_candidate_scores_are_exact(self):
+        matrix = random_ratings_matrix(60, 20, 0.6)
+        similarity = pearson_similarity(matrix)
+        indices, scores = SimHashIndex(n_tables=4, n_bits=3).nearest_neighbours(
+            matrix, 10
+        )
+        np.testing.assert_allclose(
+            scores, np.take_along_axis(similarity, indices, axis=1), atol=1e-12
+        )
+        rows, columns = SimHashIndex(n_tables=4, n_bits=3).candidate_pairs(matrix)
+        self.assertFalse(np.any(rows == columns))
+
+    def test_single_bucket_finds_exact_neighbours(self):
+        matrix = random_ratings_matrix(40, 20, 0.6)
+        _, scores = SimHashIndex(n_tables=1, n_bits=0).nearest_neighbours(matrix, 5)
+        _, expected_scores = nearest_neighbours(matrix, 5)
+        np.testing.assert_allclose(
+            -np.sort(-np.abs(scores), axis=1),
+            -np.sort(-np.abs(expected_scores), axis=1),
+        )
+
+
+class CollaborativeFilteringTests(SimpleTestCase):
+    def assertSameRecommendations(self, first, second):
+        # Items whose scores tie up to rounding may come out in either order, so only
+        # the ranked scores are compared.
+        np.testing.assert_allclose(
+            [score for _, score in first], [score for _, score in second], atol=1e-12
+        )
+
+    def test_recommend_workers_matches_predict_rating(self):
+        model = CollaborativeFiltering(random_ratings(30, 40, 300))
+        user = model.users[0]
+        recommendations = model.recommend_workers(user, n=5)
+        self.assertEqual(len(recommendations), 5)
+        for item, score in recommendations:
+            self.assertEqual(model._get_user_ratings(user)[model.item_index[item]], 0)
+            self.assertAlmostEqual(score, model._predict_rating(user, item))
+
+    def test_batch_matches_single_user_recommendations(self):
+        model = CollaborativeFiltering(random_ratings(30, 40, 300))
+        user_ids, item_ids, scores = model.recommend_workers_batch(
+            model.users, n=5, block_size=7
+        )
+        for user in model.users:
+            selected = user_ids == user
+            self.assertSameRecommendations(
+                zip(item_ids[selected], scores[selected]),
+                model.recommend_workers(user),
+            )
+
+    def test_all_neighbours_match_dense_similarity(self):
+        ratings = random_ratings(30, 40, 300)
+        dense = CollaborativeFiltering(ratings)
+        pruned = CollaborativeFiltering(ratings, n_neighbours=len(dense.users))
+        for user in dense.users:
+            self.assertSameRecommendations(
+                pruned.recommend_workers(user), dense.recommend_workers(user)
+            )
+
+    def test_neighbours_keep_strongest_similarities(self):
+        ratings = random_ratings(30, 40, 300)
+        dense = CollaborativeFiltering(ratings)
+        pruned = CollaborativeFiltering(ratings, n_neighbours=5)
+        strongest = -np.sort(-np.abs(dense.similarity_matrix), axis=1)[:, :5]
+        np.testing.assert_allclose(
+            -np.sort(-np.abs(pruned.neighbour_scores), axis=1), strongest
+        )
+
+    def test_add_and_remove_rating_match_rebuild(self):
+        ratings = random_ratings(30, 40, 300)
+        new_ratings = np.array(
+            [[99.0, 1000.0, 4.0], [99.0, 2000.0, 5.0], [3.0, 2001.0, 2.0]]
+        )
+        for n_neighbours in [None, 100]:
+            model = CollaborativeFiltering(ratings[:250], n_neighbours=n_neighbours)
+            for user, item, rating in np.vstack([ratings[250:], new_ratings]):
+                model.add_rating(user, item, rating)
+            model.remove_rating(3.0, 2001.0)
+            rebuilt = CollaborativeFiltering(
+                np.vstack([ratings, new_ratings[:2]]), n_neighbours=n_neighbours
+            )
+            for user in rebuilt.users:
+                self.assertSameRecommendations(
+                    model.recommend_workers(user), rebuilt.recommend_workers(user)
+                )
+
+    def test_updates_keep_pruned_neighbours_exact(self):
+        ratings = random_ratings(30, 40, 300)
+        new_ratings = np.array(
+            [[99.0, 1000.0, 4.0], [99.0, 1001.0, 1.0], [99.0, 1002.0, 5.0]]
+        )
+        model = CollaborativeFiltering(ratings[:250], n_neighbours=5)
+        replaced = 0
+        for user, item, rating in np.vstack([ratings[250:], new_ratings]):
+            previous_indices = model.neighbour_indices.copy()
+            model.add_rating(user, item, rating)
+            user_index = model.user_index[user]
+            changed = np.any(
+                model.neighbour_indices[: len(previous_indices)] != previous_indices,
+                axis=1,
+            )
+            changed[user_index : user_index + 1] = False
+            replaced += np.count_nonzero(changed)
+            similarity = pearson_similarity(model.user_item_matrix)
+            np.testing.assert_allclose(
+                model.neighbour_scores,
+                np.take_along_axis(similarity, model.neighbour_indices, axis=1),
+                atol=1e-12,
+            )
+            for indices in model.neighbour_indices:
+                self.assertEqual(len(np.unique(indices)), len(indices))
+            # The rating user's own row is recomputed from scratch.
+            np.testing.assert_allclose(
+                np.sort(np.abs(model.neighbour_scores[user_index])),
+                np.sort(np.abs(similarity[user_index]))[-5:],
+                atol=1e-12,
+            )
+        # Other rows took the rating user in place of their weakest neighbour.
+        self.assertGreater(replaced, 0)
+        self.assertEqual(model.neighbour_indices.shape, (31, 5))
+
+    def test_saved_model_loads_memory_mapped(self):
+        ratings = random_ratings(30, 40, 300)
+        for n_neighbours in [None, 5]:
+            model = CollaborativeFiltering(ratings, n_neighbours=n_neighbours)
+            with tempfile.TemporaryDirectory() as path:
+                model.save(path)
+                loaded = CollaborativeFiltering.load(path)
+                self.assertIsInstance(loaded.user_item_matrix, np.memmap)
+                for user in model.users:
+                    self.assertEqual(
+                        loaded.recommend_workers(user), model.recommend_workers(user)
+                    )
+                del loaded
+
+    def test_item_mode_scores_from_similar_items(self):
+        ratings = random_ratings(60, 20, 500)
+        model = CollaborativeFiltering(ratings, mode="item")
+        pruned = CollaborativeFiltering(ratings, n_neighbours=20, mode="item")
+        self.assertEqual(model.similarity_matrix.shape, (20, 20))
+        user_ids, _, scores = model.recommend_workers_batch(model.users, n=3)
+        for user in model.users:
+            recommendations = model.recommend_workers(user, n=3)
+            for item, score in recommendations:
+                self.assertAlmostEqual(score, model._predict_rating(user, item))
+            self.assertSameRecommendations(
+                pruned.recommend_workers(user, n=3), recommendations
+            )
+            self.assertSameRecommendations(
+                zip(user_ids[user_ids == user], scores[user_ids == user]),
+                recommendations,
+            )
+
+    def test_float32_model_ranks_like_float64(self):
+        ratings = random_ratings(30, 40, 300)
+        model = CollaborativeFiltering(ratings)
+        compact = CollaborativeFiltering(ratings, dtype=np.float32)
+        self.assertEqual(compact.user_item_matrix.dtype, np.float32)
+        self.assertEqual(compact.similarity_matrix.dtype, np.float32)
+        np.testing.assert_allclose(
+            compact.similarity_matrix, model.similarity_matrix, atol=1e-5
+        )
+        compact.add_rating(99.0, 2000.0, 4.0)
+        self.assertEqual(compact.user_item_matrix.dtype, np.float32)
+
+
+class MatrixFactorizationTests(SimpleTestCase):
+    def test_recommendations_skip_rated_items(self):
+        ratings = random_ratings(30, 40, 300)
+        model = MatrixFactorization(ratings, n_factors=5, n_iterations=5)
+        for user in model.users:
+            rated = set(ratings[ratings[:, 0] == user, 1].tolist())
+            for item, score in model.recommend_workers(user, n=5):
+                self.assertNotIn(item, rated)
+                self.assertAlmostEqual(score, model._predict_rating(user, item))
+
+    def test_fits_low_rank_ratings(self):
+        rng = np.random.default_rng(0)
+        users, items = np.meshgrid(np.arange(40), np.arange(30), indexing="ij")
+        ratings = 3 + rng.standard_normal((40, 2)) @ rng.standard_normal((2, 30))
+        observed = rng.random((40, 30)) < 0.5
+        model = MatrixFactorization(
+            np.column_stack([users[observed], items[observed], ratings[observed]]),
+            n_factors=3,
+            regularization=0.001,
+        )
+        predicted = model._predict_ratings(np.arange(40))
+        np.testing.assert_allclose(predicted[~observed], ratings[~observed], atol=0.1)
+
+    def test_small_memory_ceiling_matches_single_block(self):
+        ratings = random_ratings(30, 40, 300)
+        model = MatrixFactorization(ratings, n_factors=5, n_iterations=3)
+        # Room for the outer products of 4 ratings: most users and items need more.
+        small = MatrixFactorization(
+            ratings, n_factors=5, n_iterations=3, max_memory=4 * 5 * 5 * 8
+        )
+        np.testing.assert_allclose(small.user_factors, model.user_factors)
+        np.testing.assert_allclose(small.item_factors, model.item_factors)
+
+    def test_batch_and_saved_model_match_single_user(self):
+        model = MatrixFactorization(random_ratings(30, 40, 300), n_factors=5)
+        user_ids, item_ids, scores = model.recommend_workers_batch(
+            model.users, n=5, block_size=7
+        )
+        with tempfile.TemporaryDirectory() as path:
+            model.save(path)
+            loaded = MatrixFactorization.load(path)
+            self.assertIsInstance(loaded.item_factors, np.memmap)
+            for user in model.users:
+                recommendations = model.recommend_workers(user)
+                self.assertEqual(loaded.recommend_workers(user), recommendations)
+                selected = user_ids == user
+                np.testing.assert_allclose(
+                    scores[selected], [score for _, score in recommendations]
+                )
+            del loaded
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_engine_benchmark_records_every_phase(self):
+        ratings = synthetic_ratings(50, 30, 0.2)
+        self.assertEqual(len(np.unique(ratings[:, :2], axis=0)), len(ratings))
+        phases = benchmark_engine(ratings, n_neighbours=5, n_single_users=3)
+        self.assertEqual(
+            list(phases),
+            [
+                "matrix_build",
+                "similarity_build",
+                "recommend_single",
+                "recommend_batch",
+            ],
+        )
+        for result in phases.values():
+            self.assertGreaterEqual(result["seconds"], 0)
+            self.assertGreater(result["peak_memory"], 0)
+
+    def test_candidate_index_recall_counts_tied_neighbours(self):
+        # Sparse ratings give many users the same similarity (mostly +-1), so the
+        # exact neighbours of a row are one arbitrary choice among tied users.
+        matrix = random_ratings_matrix(60, 30, 0.1)
+        _, results = benchmark_candidate_index(matrix, 5, [(1, 0), (2, 2)])
+        (_, _, _, _, recall), (_, _, _, _, lsh_recall) = results
+        self.assertEqual(recall, 1.0)
+        self.assertLessEqual(lsh_recall, 1.0)
+
+
+class LoadRatingsTests(TestCase):
+    def test_loads_ratings_and_rated_tasks(self):
+        customer = Customer.objects.create(
+            username="customer", email="customer@example.com", phone_number="1"
+        )
+        worker = Worker.objects.create(
+            username="worker", email="worker@example.com", hourly_rate=20
+        )
+        now = timezone.now()
+        task_fields = dict(customer=customer, start_time=now, end_time=now)
+        task, *_ = Task.objects.bulk_create(
+            [
+                Task(title="a", worker=worker, rating=4, **task_fields),
+                Task(title="b", worker=worker, **task_fields),
+                Task(title="c", rating=2, **task_fields),
+            ]
+        )
+        users = [User.objects.create(username=f"user{i}") for i in range(5)]
+        for i in range(5):
+            Ratings.objects.create(
+                rating=i + 0.5,
+                customer=users[i],
+                worker=users[(i + 1) % 5],
+                task=task,
+            )
+
+        ratings = load_ratings(chunk_size=2)
+        # The auth.User ids of Ratings overlap the users.User ids of Task, so they are
+        # negated.
+        self.assertEqual(users[0].id, customer.id)
+        expected = [
+            [-user.id, -users[(i + 1) % 5].id, i + 0.5] for i, user in enumerate(users)
+        ]
+        expected.append([customer.id, worker.id, 4])
+        np.testing.assert_array_equal(ratings, expected)
+
+
+class SkillIndexTests(SimpleTestCase):
+    def test_match_counts_shared_skills(self):
+        index = SkillIndex()
+        index.load(
+            [(1, 20.0, True), (2, 30.0, False), (3, 10.0, True), (4, None, True)],
+            [(1, 5), (1, 6), (2, 6), (2, 7), (3, 7), (9, 5)],
+        )
+        worker_ids, matched = index.match([5, 6, 8])
+        np.testing.assert_array_equal(worker_ids, [1, 2])
+        np.testing.assert_array_equal(matched, [2, 1])
+        worker_ids, _ = index.match([6, 7], max_hourly_rate=15)
+        np.testing.assert_array_equal(worker_ids, [3])
+        worker_ids, _ = index.match([6, 7], available=True)
+        np.testing.assert_array_equal(worker_ids, [1, 3])
+
+    def test_updates_match_rebuilt_index(self):
+        rng = np.random.default_rng(0)
+        skills = {
+            worker: set(rng.integers(0, 150, 10).tolist()) for worker in range(30)
+        }
+        index = SkillIndex()
+        index.load(
+            [(worker, worker, True) for worker in range(20)],
+            [(worker, skill) for worker in range(20) for skill in skills[worker]],
+        )
+        for worker in range(20, 30):
+            index.set_worker(worker, skills[worker], hourly_rate=worker)
+        for worker in range(0, 30, 3):
+            index.remove_worker(worker)
+            del skills[worker]
+        index.add_skills([1, 2], [200])
+        index.remove_skills(None, [7])
+        for worker, worker_skills in skills.items():
+            worker_skills.discard(7)
+            if worker in (1, 2):
+                worker_skills.add(200)
+
+        for query in [[200, 1, 2, 3], list(range(0, 150, 7)), [7]]:
+            worker_ids, matched = index.match(query)
+            expected = sorted(
+                (-len(worker_skills & set(query)), worker)
+                for worker, worker_skills in skills.items()
+                if worker_skills & set(query)
+            )
+            self.assertEqual(
+                list(zip(worker_ids.tolist(), matched.tolist())),
+                [(worker, -count) for count, worker in expected],
+            )
+
+
+class SkillIndexSignalTests(TestCase):
+    def tearDown(self):
+        loaders._skill_indexes.clear()
+
+    def test_signals_keep_index_in_sync(self):
+        skills = [Skill.objects.create(name=str(i)) for i in range(3)]
+        worker = Worker.objects.create(
+            username="worker", email="worker@example.com", hourly_rate=20
+        )
+        worker.skills.add(skills[0])
+        index = worker_skill_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            worker.skills.add(skills[1], skills[2])
+            skills[0].worker_set.remove(worker)
+            worker.hourly_rate = 40
+            worker.is_available = True
+            worker.save()
+        worker_ids, matched = index.match([skill.pk for skill in skills])
+        self.assertEqual(list(worker_ids), [worker.pk])
+        self.assertEqual(list(matched), [2])
+        self.assertEqual(index.hourly_rates[index.rows[worker.pk]], 40)
+        self.assertTrue(index.available[index.rows[worker.pk]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            skills[1].delete()
+        self.assertEqual(list(index.match([skills[2].pk])[0]), [worker.pk])
+        self.assertEqual(len(index.match([skills[1].pk])[0]), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            worker.skills.clear()
+        self.assertEqual(len(index.match([skill.pk for skill in skills])[0]), 0)
+        worker_id = worker.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            worker.delete()
+        self.assertNotIn(worker_id, index)
+
+
+def use_temporary_cache(test):
+    """
+    points the recommendations cache at a new temporary directory until the test ends,
+    so that tests neither read nor clear the cache of the project.
+    """
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    cache = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": directory.name,
+    }
+    override = override_settings(CACHES={**settings.CACHES, CACHE_ALIAS: cache})
+    override.enable()
+    test.addCleanup(override.disable)
+
+
+class RecommendationCacheTests(TestCase):
+    def setUp(self):
+        use_temporary_cache(self)
+        reset_cache_stats()
+
+    def test_counts_hits_and_misses(self):
+        rankings = iter([[(1, 1.0)], [(2, 0.5)]])
+        for _ in range(3):
+            self.assertEqual(
+                cached_recommendations(task_key(1), lambda: next(rankings)), [(1, 1.0)]
+            )
+        self.assertEqual(cache_stats(), {"hits": 2, "misses": 1, "hit_rate": 2 / 3})
+
+    def test_invalidation_reaches_other_processes(self):
+        cache = caches[CACHE_ALIAS]
+        cache.set(task_key(1), [(1, 1.0)])
+        # refresh_recommendations runs in a process of its own. This one is only given
+        # the cache settings, so it cannot touch the database of the project.
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import json, sys; "
+                "from django.conf import settings; "
+                "settings.configure(CACHES=json.loads(sys.argv[1])); "
+                "from recommendation_algorithm.cache import invalidate; "
+                "invalidate(task_ids=[1])",
+                json.dumps(settings.CACHES),
+            ],
+            cwd=settings.BASE_DIR,
+            check=True,
+        )
+        self.assertIsNone(cache.get(task_key(1)))
+
+    def test_skillset_changes_invalidate_affected_entries(self):
+        customer = Customer.objects.create(
+            username="customer", email="customer@example.com", phone_number="1"
+        )
+        now = timezone.now()
+        tasks = Task.objects.bulk_create(
+            [
+                Task(title=str(i), customer=customer, start_time=now, end_time=now)
+                for i in range(2)
+            ]
+        )
+        skillsets = [Skillset.objects.create(name=str(i)) for i in range(2)]
+        users = [User.objects.create(username=str(i)) for i in range(2)]
+        TaskSkillset.objects.create(task=tasks[0], skillset=skillsets[0])
+        TaskSkillset.objects.create(task=tasks[1], skillset=skillsets[1])
+        WorkerSkillset.objects.create(worker=users[1], skillset=skillsets[1])
+
+        cache = caches[CACHE_ALIAS]
+        keys = [task_key(task.pk) for task in tasks]
+        keys += [worker_key(user.pk) for user in users]
+        cache.set_many(dict.fromkeys(keys, []))
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkerSkillset.objects.create(worker=users[0], skillset=skillsets[0])
+        self.assertEqual(list(cache.get_many(keys)), keys[1:2] + keys[3:])
+
+        cache.set_many(dict.fromkeys(keys, []))
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskSkillset.objects.create(task=tasks[0], skillset=skillsets[1])
+        self.assertEqual(list(cache.get_many(keys)), keys[1:3])
+
+
+class RefreshRecommendationsTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(
+            username="customer", email="customer@example.com", phone_number="1"
+        )
+        now = timezone.now()
+        self.tasks = Task.objects.bulk_create(
+            [
+                Task(title=str(i), customer=customer, start_time=now, end_time=now)
+                for i in range(4)
+            ]
+        )
+        self.skillsets = [Skillset.objects.create(name=str(i)) for i in range(3)]
+        self.users = [User.objects.create(username=str(i)) for i in range(4)]
+        for task, skillsets in zip(self.tasks, [[0], [0, 1], [1, 2], [2]]):
+            for skillset in skillsets:
+                TaskSkillset.objects.create(
+                    task=task, skillset=self.skillsets[skillset]
+                )
+        for user, skillsets in zip(self.users, [[0], [0, 1], [2], []]):
+            for skillset in skillsets:
+                WorkerSkillset.objects.create(
+                    worker=user, skillset=self.skillsets[skillset]
+                )
+
+    def tearDown(self):
+        loaders._skill_indexes.clear()
+
+    def refresh(self, *args):
+        call_command("refresh_recommendations", *args, stdout=StringIO())
+        return {
+            "workers": [recommended_workers(task.pk)[0] for task in self.tasks],
+            "tasks": [recommended_tasks(user.pk)[0] for user in self.users],
+        }
+
+    def test_full_refresh_ranks_by_skill_overlap(self):
+        users = [user.pk for user in self.users]
+        tasks = [task.pk for task in self.tasks]
+        recommendations = self.refresh()
+        self.assertEqual(
+            recommendations["workers"][1], [(users[1], 1.0), (users[0], 0.5)]
+        )
+        self.assertEqual(
+            recommendations["tasks"][1],
+            [(tasks[1], 1.0), (tasks[0], 0.5), (tasks[2], 0.5)],
+        )
+        self.assertEqual(recommendations["tasks"][3], [])
+        self.refresh("--top", "1")
+        self.refresh("--top", "1")
+        self.assertEqual(RecommendationGeneration.objects.count(), 2)
+        self.assertEqual(recommended_workers(self.tasks[1].pk)[0], [(users[1], 1.0)])
+
+    def test_pages_follow_their_generation(self):
+        skillset = self.skillsets[0]
+        users = [User.objects.create(username=f"worker{i}") for i in range(7)]
+        WorkerSkillset.objects.bulk_create(
+            [WorkerSkillset(worker=user, skillset=skillset) for user in users]
+        )
+        self.refresh()
+        task = self.tasks[0]
+        expected, cursor = recommended_workers(task.pk, page_size=100)
+        self.assertIsNone(cursor)
+
+        pages = []
+        page, cursor = recommended_workers(task.pk, page_size=4)
+        pages += page
+        WorkerSkillset.objects.filter(worker__in=users[:3]).delete()
+        self.refresh()
+        while cursor is not None:
+            page, cursor = recommended_workers(
+                task.pk, decode_cursor(encode_cursor(cursor)), page_size=4
+            )
+            pages += page
+        self.assertEqual(pages, expected)
+        self.assertEqual(len(recommended_workers(task.pk, page_size=100)[0]), 6)
+
+    def test_pages_follow_their_generation_across_incremental_refresh(self):
+        skillset = self.skillsets[0]
+        users = [User.objects.create(username=f"worker{i}") for i in range(7)]
+        WorkerSkillset.objects.bulk_create(
+            [WorkerSkillset(worker=user, skillset=skillset) for user in users]
+        )
+        self.refresh()
+        task = self.tasks[0]
+        expected, cursor = recommended_workers(task.pk, page_size=100)
+
+        pages = []
+        page, cursor = recommended_workers(task.pk, page_size=4)
+        pages += page
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkerSkillset.objects.filter(worker__in=users[3:]).delete()
+        self.refresh("--incremental")
+        while cursor is not None:
+            page, cursor = recommended_workers(task.pk, cursor, page_size=4)
+            pages += page
+        self.assertEqual(pages, expected)
+        self.assertEqual(len(recommended_workers(task.pk, page_size=100)[0]), 5)
+        self.assertEqual(
+            recommended_tasks(self.users[1].pk)[0],
+            [(self.tasks[1].pk, 1.0), (self.tasks[0].pk, 0.5), (self.tasks[2].pk, 0.5)],
+        )
+
+    def test_incremental_refresh_matches_full_refresh(self):
+        self.refresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkerSkillset.objects.create(
+                worker=self.users[3], skillset=self.skillsets[1]
+            )
+            WorkerSkillset.objects.filter(worker=self.users[0]).delete()
+            TaskSkillset.objects.create(task=self.tasks[3], skillset=self.skillsets[0])
+            Task.objects.filter(pk=self.tasks[2].pk).delete()
+        recommendations = self.refresh("--incremental")
+        self.assertEqual(recommendations["workers"][2], [])
+        self.assertEqual(recommendations, self.refresh())
+
+
+@override_settings(
+    TEMPLATES=[
+        {
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+            "OPTIONS": {
+                "loaders": [
+                    (
+                        "django.template.loaders.locmem.Loader",
+                        {
+                            "recommend_worker.html": "{% for r in recommendations %}"
+                            "{{ r.worker.pk }} {% endfor %}",
+                            "recommend_task.html": "{% for r in recommendations %}"
+                            "{{ r.task.pk }} {% endfor %}",
+                        },
+                    )
+                ]
+            },
+        }
+    ]
+)
+class RecommendationViewTests(TestCase):
+    def setUp(self):
+        use_temporary_cache(self)
+        customer = Customer.objects.create(
+            username="customer", email="customer@example.com", phone_number="1"
+        )
+        self.skillset = Skillset.objects.create(name="cleaning")
+        self.task = Task.objects.create(
+            title="task",
+            customer=customer,
+            start_time=timezone.now(),
+            end_time=timezone.now(),
+        )
+        TaskSkillset.objects.create(task=self.task, skillset=self.skillset)
+        self.worker = User.objects.create(username="worker")
+        WorkerSkillset.objects.create(worker=self.worker, skillset=self.skillset)
+
+    def tearDown(self):
+        loaders._skill_indexes.clear()
+
+    def get(self, view, id_):
+        request = RequestFactory().get("/")
+        request.user = self.worker
+        caches[CACHE_ALIAS].clear()
+        with self.assertNumQueries(4):
+            response = view(request, id_)
+        return response.content.decode().split()
+
+    def refresh(self):
+        call_command("refresh_recommendations", stdout=StringIO())
+
+    def test_recommend_worker_queries_do_not_grow_with_workers(self):
+        self.refresh()
+        self.assertEqual(
+            self.get(recommend_worker, self.task.pk), [str(self.worker.pk)]
+        )
+        users = [User.objects.create(username=f"worker{i}") for i in range(10)]
+        WorkerSkillset.objects.bulk_create(
+            [WorkerSkillset(worker=user, skillset=self.skillset) for user in users]
+        )
+        self.refresh()
+        self.assertEqual(len(self.get(recommend_worker, self.task.pk)), 11)
+
+    def test_recommend_task_queries_do_not_grow_with_tasks(self):
+        self.refresh()
+        self.assertEqual(self.get(recommend_task, self.worker.pk), [str(self.task.pk)])
+        tasks = Task.objects.bulk_create(
+            [
+                Task(
+                    title=str(i),
+                    customer=self.task.customer,
+                    start_time=self.task.start_time,
+                    end_time=self.task.end_time,
+                )
+                for i in range(10)
+            ]
+        )
+        TaskSkillset.objects.bulk_create(
+            [TaskSkillset(task=task, skillset=self.skillset) for task in tasks]
+        )
+        self.refresh()
+        self.assertEqual(len(self.get(recommend_task, self.worker.pk)), 11)
+
+    def test_views_leave_the_other_kind_of_recommendations(self):
+        self.refresh()
+        counts = {
+            kind: Recommendation.objects.filter(kind=kind).count()
+            for kind in ("worker", "task")
+        }
+        self.assertEqual(counts, {"worker": 1, "task": 1})
+        self.get(recommend_worker, self.task.pk)
+        self.get(recommend_task, self.worker.pk)
+        self.assertEqual(
+            self.get(recommend_worker, self.task.pk), [str(self.worker.pk)]
+        )
+        self.assertEqual(self.get(recommend_task, self.worker.pk), [str(self.task.pk)])
+        for kind, count in counts.items():
+            self.assertEqual(Recommendation.objects.filter(kind=kind).count(), count)
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            username="customer", email="customer@example.com", phone_number="1"
+        )
+        self.workers = [
+            Worker.objects.create(
+                username=f"worker{i}",
+                email=f"worker{i}@example.com",
+                hourly_rate=20,
+                is_available=True,
+            )
+            for i in range(2)
+        ]
+        now = timezone.now()
+        self.task_fields = dict(customer=self.customer, start_time=now, end_time=now)
+
+    def aggregates(self):
+        return [
+            (worker.rating_count, worker.rating_sum, worker.average_rating)
+            for worker in Worker.objects.order_by("pk")
+        ]
+
+    def test_task_ratings_update_aggregates(self):
+        w0, w1 = self.workers
+        task = Task.objects.create(
+            title="a", worker=w0, rating=4, status="completed", **self.task_fields
+        )
+        Task.objects.create(
+            title="b", worker=w0, rating=2, status="completed", **self.task_fields
+        )
+        self.assertEqual(self.aggregates(), [(2, 6, 3), (0, 0, 0)])
+
+        task.rating = 5
+        task.save(update_fields=["rating"])
+        task.title = "renamed"
+        # Only the update and its RecommendationChange: the rating is not read.
+        with self.assertNumQueries(2):
+            task.save(update_fields=["title"])
+        self.assertEqual(self.aggregates(), [(2, 7, 3.5), (0, 0, 0)])
+
+        task.worker = w1
+        task.save()
+        self.assertEqual(self.aggregates(), [(1, 2, 2), (1, 5, 5)])
+        task.rating = None
+        task.status = "rejected"
+        with CaptureQueriesContext(connection) as queries:
+            task.save()
+        self.assertEqual(self.aggregates(), [(1, 2, 2), (0, 0, 0)])
+        # The rating and status receivers share one read of the stored task.
+        selects = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith('SELECT "tasks_task"')
+        ]
+        self.assertEqual(len(selects), 1)
+
+        Task.objects.filter(worker=w0).delete()
+        self.assertEqual(self.aggregates(), [(0, 0, 0), (0, 0, 0)])
+
+    def test_rated_task_for_unavailable_worker(self):
+        w0 = self.workers[0]
+        Worker.objects.filter(pk=w0.pk).update(is_available=False)
+        w0.refresh_from_db()
+        # send_notifications declines the task with a nested save that unassigns w0.
+        task = Task.objects.create(
+            title="a", worker=w0, rating=4, status="completed", **self.task_fields
+        )
+        task.refresh_from_db()
+        self.assertEqual((task.worker, task.status), (None, "rejected"))
+        self.assertEqual(self.aggregates(), [(0, 0, 0), (0, 0, 0)])
+
+    def test_removing_uncounted_ratings(self):
+        w0, w1 = self.workers
+        # bulk_create sends no signals, so these ratings are not counted.
+        tasks = Task.objects.bulk_create(
+            [
+                Task(title="a", worker=w0, rating=4, **self.task_fields),
+                Task(title="b", worker=w1, rating=5, **self.task_fields),
+            ]
+        )
+        tasks[0].delete()
+        tasks[1].rating = 3
+        tasks[1].save()
+        self.assertEqual(self.aggregates(), [(0, 0, 0), (0, 0, 0)])
+
+    def test_reconcile_ratings_repairs_drift(self):
+        w0, w1 = self.workers
+        Task.objects.bulk_create(
+            [
+                Task(title="a", worker=w0, rating=4, **self.task_fields),
+                Task(title="b", worker=w0, rating=5, **self.task_fields),
+                Task(title="c", worker=w1, **self.task_fields),
+            ]
+        )
+        Worker.objects.filter(pk=w1.pk).update(rating_count=3, rating_sum=1)
+        # Ratings rows are not counted: their users are auth.User rows, whose ids say
+        # nothing about workers.
+        users = [User.objects.create(username=str(i)) for i in range(4)]
+        Ratings.objects.bulk_create(
+            [
+                Ratings(
+                    rating=1,
+                    review="",
+                    customer=users[0],
+                    worker=user,
+                    task=Task.objects.first(),
+                )
+                for user in users
+            ]
+        )
+
+        output = StringIO()
+        call_command("reconcile_ratings", stdout=output)
+        self.assertIn("of 2 workers", output.getvalue())
+        self.assertEqual(self.aggregates(), [(2, 9, 4.5), (0, 0, 0)])
+
+        call_command("reconcile_ratings", stdout=output)
+        self.assertIn("of 0 workers", output.getvalue())
@@ -1,65 +1,76 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.core.exceptions import BadRequest
+from tasks.models import Task
+from .cache import cached_recommendations, task_key, worker_key
 from .models import Recommendation, WorkerSkillset, Skillset
+from .refresh import (
+    decode_cursor,
+    encode_cursor,
+    recommended_tasks,
+    recommended_workers,
+)
 
 
 @login_required
 def recommend_worker(request, task_id):
-    task = Task.objects.get(id=task_id)
-    skillsets = task.skillset.all()
-
-    # Find all workers who have the required skillsets
-    workers = User.objects.filter(is_worker=True)
-    for skillset in skillsets:
-        workers = workers.filter(worker_skillset__skillset=skillset)
-
-    # Score each worker based on their skillset and hourly rate
-    recommendations = []
-    for worker in workers:
-        worker_skillsets = WorkerSkillset.objects.filter(worker=worker)
-        score = 0
-        for task_skillset in skillsets:
-            if worker_skillsets.filter(skillset=task_skillset).exists():
-                score += 1
-        score /= len(skillsets)
-        score *= 1 - (worker.worker.hourly_rate / task.price)
-        recommendation = Recommendation(worker=worker, task=task, score=score)
-        recommendations.append(recommendation)
-        recommendation.save()
+    task = get_object_or_404(Task, id=task_id)
+    ranking, next_cursor = recommendation_page(
+        request,
+        task_key(task.id),
+        lambda cursor=None: recommended_workers(task.id, cursor),
+    )
 
-    # Sort the recommendations by score in descending order
-    recommendations = sorted(recommendations, key=lambda r: r.score, reverse=True)
+    workers = User.objects.in_bulk([worker_id for worker_id, _ in ranking])
+    recommendations = [
+        Recommendation(worker=workers[worker_id], task=task, score=score)
+        for worker_id, score in ranking
+        if worker_id in workers
+    ]
 
     return render(
-        request, "recommend_worker.html", {"recommendations": recommendations}
+        request,
+        "recommend_worker.html",
+        {"recommendations": recommendations, "next_cursor": next_cursor},
     )
 
 
 @login_required
 def recommend_task(request, worker_id):
-    worker = User.objects.get(id=worker_id)
-    worker_skillsets = WorkerSkillset.objects.filter(worker=worker)
+    worker = get_object_or_404(User, id=worker_id)
+    ranking, next_cursor = recommendation_page(
+        request,
+        worker_key(worker.id),
+        lambda cursor=None: recommended_tasks(worker.id, cursor),
+    )
 
-    # Find all tasks that require the worker's skillset
-    tasks = Task.objects.all()
-    for worker_skillset in worker_skillsets:
-        tasks = tasks.filter(skillset=worker_skillset.skillset)
+    tasks = Task.objects.in_bulk([task_id for task_id, _ in ranking])
+    recommendations = [
+        Recommendation(worker=worker, task=tasks[task_id], score=score)
+        for task_id, score in ranking
+        if task_id in tasks
+    ]
 
-    # Score each task based on how many of the worker's skillsets are required
-    recommendations = []
-    for task in tasks:
-        task_skillsets = task.skillset.all()
-        score = 0
-        for worker_skillset in worker_skillsets:
-            if task_skillsets.filter(id=worker_skillset.skillset.id).exists():
-                score += 1
-        score /= len(worker_skillsets)
-        recommendation = Recommendation(worker=worker, task=task, score=score)
-        recommendations.append(recommendation)
-        recommendation.save()
+    return render(
+        request,
+        "recommend_task.html",
+        {"recommendations": recommendations, "next_cursor": next_cursor},
+    )
 
-    # Sort the recommendations by score in descending order
-    recommendations = sorted(recommendations, key=lambda r: r.score, reverse=True)
 
-    return render(request, "recommend_task.html", {"recommendations": recommendations})
+def recommendation_page(request, key, recommended):
+    """
+    returns the page of recommendations after the cursor in the "after" query parameter
+    and the encoded cursor of the next page. The first page comes from the cache.
+    """
+    after = request.GET.get("after")
+    if after:
+        try:
+            cursor = decode_cursor(after)
+        except ValueError:
+            raise BadRequest("Invalid cursor")
+        ranking, next_cursor = recommended(cursor)
+    else:
+        ranking, next_cursor = cached_recommendations(key, recommended)
+    return ranking, next_cursor and encode_cursor(next_cursor)
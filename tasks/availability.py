@@ -0,0 +1,270 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from users.indexes import CHUNK_SIZE, IndexRegistry
+from users.models import Worker
+
+from .models import Task, WorkerUnavailability
+
+# Task statuses that do not book the worker's time.
+UNBOOKED_STATUSES = ("rejected",)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Process-local interval indexes, loaded on first use and kept up to date by the
+# receivers in signals.py.
+_interval_indexes = IndexRegistry()
+
+
+def timestamp(time):
+    """
+    returns an aware datetime as an integer number of microseconds since the epoch.
+    """
+    return (time - _EPOCH) // timedelta(microseconds=1)
+
+
+class IntervalIndex:
+    """
+    A process-local index of half-open [start, end) intervals of workers, for finding
+    every interval that overlaps a query window without scanning all of them.
+
+    Intervals are grouped into classes by length, class k holding the intervals with
+    2**(k - 1) <= end - start < 2**k, and every class is kept as parallel arrays sorted
+    by start. An interval of class k that overlaps [a, b) starts in (a - 2**k, b), so a
+    query is two binary searches per class and a vectorized check of the ends of the
+    intervals between them, which are within a factor of two of the length of the ones
+    that really overlap. Times are integers, see timestamp.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.load([])
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __contains__(self, interval_id):
+        return interval_id in self.intervals
+
+    def load(self, intervals):
+        """
+        replaces the contents of the index with intervals, given as (interval_id,
+        worker_id, start, end) rows. Empty intervals are left out.
+        """
+        rows = np.array(
+            [row for row in intervals if row[3] > row[2]], dtype=np.int64
+        ).reshape(-1, 4)
+        rows = rows[np.argsort(rows[:, 2], kind="stable")]
+        length_classes = _length_class(rows[:, 3] - rows[:, 2])
+        with self.lock:
+            self.classes = {
+                int(k): rows[length_classes == k].T.copy()
+                for k in np.unique(length_classes)
+            }
+            self.intervals = {
+                int(row[0]): (int(k), int(row[2]))
+                for row, k in zip(rows, length_classes)
+            }
+
+    def set_interval(self, interval_id, worker_id, start, end):
+        """
+        adds an interval to the index, or replaces it. An empty interval is removed.
+        """
+        with self.lock:
+            self.remove_interval(interval_id)
+            if end <= start:
+                return
+            k = int(_length_class(end - start))
+            columns = self.classes.get(k, np.empty((4, 0), dtype=np.int64))
+            position = np.searchsorted(columns[2], start, side="right")
+            self.classes[k] = np.insert(
+                columns, position, [interval_id, worker_id, start, end], axis=1
+            )
+            self.intervals[interval_id] = (k, start)
+
+    def remove_interval(self, interval_id):
+        """
+        removes an interval from the index, if it is in it.
+        """
+        with self.lock:
+            if interval_id not in self.intervals:
+                return
+            k, start = self.intervals.pop(interval_id)
+            columns = self.classes[k]
+            lo = np.searchsorted(columns[2], start, side="left")
+            hi = np.searchsorted(columns[2], start, side="right")
+            position = lo + np.flatnonzero(columns[0, lo:hi] == interval_id)[0]
+            self.classes[k] = np.delete(columns, position, axis=1)
+
+    def remove_worker(self, worker_id):
+        """
+        removes every interval of a worker from the index.
+        """
+        with self.lock:
+            for k, columns in self.classes.items():
+                removed = columns[1] == worker_id
+                for interval_id in columns[0, removed].tolist():
+                    del self.intervals[interval_id]
+                self.classes[k] = columns[:, ~removed]
+
+    def overlapping(self, start, end):
+        """
+        returns the ids of the intervals that overlap [start, end) and the ids of their
+        workers, in parallel arrays.
+        """
+        found = []
+        with self.lock:
+            for k, columns in self.classes.items():
+                lo = np.searchsorted(columns[2], start - 2**k, side="right")
+                hi = np.searchsorted(columns[2], end, side="left")
+                candidates = columns[:, lo:hi]
+                found.append(candidates[:2, candidates[3] > start])
+        if not found:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        interval_ids, worker_ids = np.concatenate(found, axis=1)
+        return interval_ids, worker_ids
+
+
+def _length_class(lengths):
+    """
+    returns the length class of intervals, the bit length of their length, which is
+    exact for lengths below 2**53 microseconds (285 years).
+    """
+    return np.frexp(np.asarray(lengths, dtype=np.float64))[1]
+
+
+def booking_index(load=True):
+    """
+    returns the process-local IntervalIndex of the tasks booked for a worker, keyed by
+    task id, loading it from the database on first use. With load=False it returns None
+    instead if the index has not been loaded yet.
+    """
+    return _interval_index("bookings", _booked_tasks, load)
+
+
+def unavailability_index(load=True):
+    """
+    returns the process-local IntervalIndex of the WorkerUnavailability rows, keyed by
+    their id, loading it from the database on first use. With load=False it returns None
+    instead if the index has not been loaded yet.
+    """
+    return _interval_index("unavailabilities", WorkerUnavailability.objects.all, load)
+
+
+def _interval_index(name, queryset, load):
+    """
+    returns the named interval index, loading it from the rows of queryset() on first
+    use if load.
+    """
+
+    def load_interval_index():
+        rows = queryset().values_list("id", "worker_id", "start_time", "end_time")
+        index = IntervalIndex()
+        index.load(
+            (id_, worker_id, timestamp(start), timestamp(end))
+            for id_, worker_id, start, end in rows.iterator(chunk_size=CHUNK_SIZE)
+        )
+        return index
+
+    return _interval_indexes.get(name, load_interval_index, load)
+
+
+def _booked_tasks():
+    return Task.objects.filter(worker__isnull=False).exclude(
+        status__in=UNBOOKED_STATUSES
+    )
+
+
+def is_booking(task):
+    """
+    returns whether a task books its worker's time.
+    """
+    return task.worker_id is not None and task.status not in UNBOOKED_STATUSES
+
+
+def busy_workers(start_time, end_time):
+    """
+    returns the set of ids of the workers that are booked for a task or unavailable at
+    some time in [start_time, end_time).
+    """
+    start, end = timestamp(start_time), timestamp(end_time)
+    _, booked = booking_index().overlapping(start, end)
+    _, unavailable = unavailability_index().overlapping(start, end)
+    return set(booked.tolist()) | set(unavailable.tolist())
+
+
+def free_workers(start_time, end_time, worker_ids=None):
+    """
+    returns the ids of the workers that are free for the whole of [start_time,
+    end_time): available, and neither booked for a task nor unavailable in it. With
+    worker_ids only those workers are considered, in their order.
+    """
+    busy = busy_workers(start_time, end_time)
+    workers = Worker.objects.filter(is_available=True)
+    if worker_ids is not None:
+        candidates = [worker for worker in worker_ids if worker not in busy]
+        available = set(workers.filter(id__in=candidates).values_list("id", flat=True))
+        return [worker for worker in candidates if worker in available]
+    workers = workers.order_by("id")
+    return [
+        worker
+        for worker in workers.values_list("id", flat=True).iterator(
+            chunk_size=CHUNK_SIZE
+        )
+        if worker not in busy
+    ]
+
+
+def overlapping_tasks(worker_id, start_time, end_time):
+    """
+    returns the tasks booked for the worker that overlap [start_time, end_time), from
+    the database, so they include tasks booked by other processes.
+    """
+    return _booked_tasks().filter(
+        worker_id=worker_id, start_time__lt=end_time, end_time__gt=start_time
+    )
+
+
+def overlapping_unavailabilities(worker_id, start_time, end_time):
+    """
+    returns the WorkerUnavailability rows of the worker that overlap [start_time,
+    end_time), from the database, so they include rows added by other processes.
+    """
+    return WorkerUnavailability.objects.filter(
+        worker_id=worker_id, start_time__lt=end_time, end_time__gt=start_time
+    )
+
+
+def is_free(worker_id, start_time, end_time, exclude_task_id=None):
+    """
+    returns whether the worker is neither booked for a task (other than
+    exclude_task_id) nor unavailable at any time in [start_time, end_time), from the
+    database.
+    """
+    tasks = overlapping_tasks(worker_id, start_time, end_time)
+    if exclude_task_id is not None:
+        tasks = tasks.exclude(pk=exclude_task_id)
+    unavailabilities = overlapping_unavailabilities(worker_id, start_time, end_time)
+    return not tasks.exists() and not unavailabilities.exists()
+
+
+def double_bookings():
+    """
+    returns the (task_id, other_task_id) pairs of overlapping tasks booked for the same
+    worker, found in one pass over the tasks ordered by worker and start time.
+    """
+    pairs = []
+    tasks = _booked_tasks().order_by("worker_id", "start_time", "id")
+    current_worker, open_tasks = None, []
+    for task_id, worker_id, start, end in tasks.values_list(
+        "id", "worker_id", "start_time", "end_time"
+    ).iterator(chunk_size=CHUNK_SIZE):
+        if worker_id != current_worker:
+            current_worker, open_tasks = worker_id, []
+        open_tasks = [(other, until) for other, until in open_tasks if until > start]
+        pairs.extend((other, task_id) for other, _ in open_tasks)
+        if end > start:
+            open_tasks.append((task_id, end))
+    return pairs
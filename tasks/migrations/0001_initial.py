@@ -0,0 +1,34 @@
+# Generated by Django 4.1.7 on 2026-10-16 22:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('users', '0003_skill_remove_worker_skillset_worker_skills'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('location', models.CharField(max_length=100)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('last_updated_time', models.DateTimeField(auto_now=True)),
+                ('status', models.CharField(choices=[('in-progress', 'In Progress'), ('completed', 'Completed'), ('rejected', 'Rejected')], max_length=20)),
+                ('rating', models.IntegerField(blank=True, null=True)),
+                ('review', models.TextField(blank=True, null=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='users.customer')),
+                ('worker', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tasks', to='users.worker')),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.1.7 on 2026-10-16 22:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_outgoingemail'),
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerUnavailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['worker', 'start_time', 'end_time'], name='tasks_task_worker__78ec33_idx'),
+        ),
+        migrations.AddField(
+            model_name='workerunavailability',
+            name='worker',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unavailabilities', to='users.worker'),
+        ),
+        migrations.AddIndex(
+            model_name='workerunavailability',
+            index=models.Index(fields=['worker', 'start_time', 'end_time'], name='tasks_worke_worker__15b542_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from users.geo import geocode
 from users.models import Customer, Worker
 
 
@@ -14,6 +16,9 @@ class Task(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     location = models.CharField(max_length=100)
+    # Coordinates of location, geocoded from the gazetteer when the task is saved.
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     created_time = models.DateTimeField(auto_now_add=True)
     last_updated_time = models.DateTimeField(auto_now=True)
     status = models.CharField(
@@ -29,3 +34,49 @@ class Task(models.Model):
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        self.latitude, self.longitude = geocode(self.location)
+        super().save(*args, **kwargs)
+
+    def clean(self):
+        """
+        Checks that the task ends after it starts and that its worker is not already
+        booked for another task at the same time.
+        """
+        from .availability import is_booking, overlapping_tasks
+
+        if self.start_time is None or self.end_time is None:
+            return
+        if self.end_time <= self.start_time:
+            raise ValidationError({"end_time": "The task must end after it starts."})
+        if is_booking(self):
+            overlapping = overlapping_tasks(
+                self.worker_id, self.start_time, self.end_time
+            ).exclude(pk=self.pk)
+            if overlapping.exists():
+                raise ValidationError(
+                    {"worker": "The worker is already booked at this time."}
+                )
+
+    class Meta:
+        indexes = [models.Index(fields=["worker", "start_time", "end_time"])]
+
+
+class WorkerUnavailability(models.Model):
+    """
+    A period in which a worker cannot take tasks, in addition to the tasks they are
+    booked for.
+    """
+
+    worker = models.ForeignKey(
+        Worker, on_delete=models.CASCADE, related_name="unavailabilities"
+    )
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["worker", "start_time", "end_time"])]
+
+    def __str__(self):
+        return f"{self.worker} unavailable from {self.start_time} to {self.end_time}"
@@ -1,50 +1,176 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from tasks.models import Task
+from tasks.availability import (
+    booking_index,
+    is_booking,
+    is_free,
+    timestamp,
+    unavailability_index,
+)
+from tasks.models import Task, WorkerUnavailability
+from users.indexes import on_commit_if_loaded
+from users.models import Worker
+from users.outbox import enqueue_mail
+from users.ratings import RATED_FIELDS, update_rating_aggregates
+
+
+@receiver(pre_save, sender=Task)
+def remember_saved_task(sender, instance, update_fields=None, **kwargs):
+    """
+    Records the (worker_id, rating) and status stored for a task that is about to be
+    saved, so that update_worker_rating applies only the change of its rating and
+    send_notifications only emails the customer when the save changes its status.
+    Both are read in one query, and only if the save writes them.
+    """
+    fields = None if update_fields is None else set(update_fields)
+    rated = fields is None or bool(RATED_FIELDS & fields)
+    saved = None
+    if not instance._state.adding and (rated or "status" in fields):
+        saved = (
+            Task.objects.filter(pk=instance.pk)
+            .values_list("worker_id", "rating", "status")
+            .first()
+        )
+
+    if not rated:
+        instance._saved_rating = (instance.worker_id, instance.rating)
+    elif saved is None:
+        instance._saved_rating = (None, None)
+    else:
+        instance._saved_rating = saved[:2]
+    if instance._state.adding or (fields is not None and "status" not in fields):
+        instance._saved_status = instance.status
+    else:
+        instance._saved_status = saved and saved[2]
+
+
+@receiver(post_save, sender=Task)
+def update_worker_rating(sender, instance, **kwargs):
+    """
+    Applies a change of the rating or worker of a saved task to the rating aggregates
+    of its workers. It is connected before send_notifications, whose nested save of a
+    declined task reads the rating it stores and replaces instance._saved_rating, so
+    the outer save has to be applied first.
+    """
+    update_rating_aggregates(
+        instance._saved_rating, (instance.worker_id, instance.rating)
+    )
+
+
+@receiver(post_delete, sender=Task)
+def remove_worker_rating(sender, instance, **kwargs):
+    update_rating_aggregates((instance.worker_id, instance.rating), (None, None))
 
 
 @receiver(post_save, sender=Task)
 def send_notifications(sender, instance, created, **kwargs):
     """
-    Sends notifications to the customer and worker when a task is created and saved.
+    Queues notifications to the customer and worker when a task is created and when its
+    status changes. A new task is declined if its worker is not available or is booked
+    or unavailable at some time during it. The emails are queued in the current transaction, if there is one;
+    save tasks in transaction.atomic(), as TaskCreateView does, to queue them only if
+    the task is saved.
     """
     if created:
-        # Send task request notification to worker
         worker = instance.worker
+        if worker is None:
+            return
+
+        # Queue task request notification to worker
         subject = "New task request"
         message = (
-            f"You have a new task request from {instance.customer} for {instance.task}"
+            f"You have a new task request from {instance.customer} for {instance.title}"
         )
-        worker.email_user(subject, message)
+        enqueue_mail(subject, message, [worker.email])
 
-        # Check worker availability based on customer date and time selection
-        if (
-            instance.date < worker.unavailability_start
-            or instance.date > worker.unavailability_end
+        # Check worker availability, and that the task fits in their calendar
+        if not worker.is_available or (
+            is_booking(instance)
+            and not is_free(
+                worker.pk, instance.start_time, instance.end_time, instance.pk
+            )
         ):
-            # Send notification to worker that they are unavailable
+            # Queue notification to worker that they are unavailable
             subject = "Task request declined"
             message = (
-                f"You have declined the task request from {instance.customer} for {instance.task} "
-                f"because you are not available on the selected date and time."
+                f"You have declined the task request from {instance.customer} for {instance.title} "
+                f"because you are not available."
             )
-            worker.email_user(subject, message)
+            enqueue_mail(subject, message, [worker.email])
             instance.worker = None
             instance.status = "rejected"
-            instance.save()
+            instance.save(update_fields=["worker", "status"])
         else:
-            # Send notification to customer that task request has been accepted
+            # Queue notification to customer that task request has been accepted
             subject = "Task request accepted"
             message = (
-                f"Your task request for {instance.task} has been accepted by {worker}."
+                f"Your task request for {instance.title} has been accepted by {worker}."
             )
-            instance.customer.email_user(subject, message)
+            enqueue_mail(subject, message, [instance.customer.email])
 
-    elif not instance.accepted:
-        # Send task acceptance/rejection notification to customer
+    elif instance.status != instance._saved_status:
+        # Queue task acceptance/rejection notification to customer
         subject = "Task request status update"
-        if instance.status == "accepted":
-            message = f"Your task request for {instance.task} has been accepted by {instance.worker}."
+        if instance.status == "in-progress" and instance.worker is not None:
+            message = f"Your task request for {instance.title} has been accepted by {instance.worker}."
+        elif instance.status == "rejected":
+            message = f"Your task request for {instance.title} has been declined."
         else:
-            message = f"Your task request for {instance.task} has been declined by {instance.worker}."
-        instance.customer.email_user(subject, message)
+            return
+        enqueue_mail(subject, message, [instance.customer.email])
+
+
+@receiver(post_save, sender=Task)
+def update_task_in_booking_index(sender, instance, **kwargs):
+    """
+    Adds a saved task to the booking index, or removes it if it no longer books its
+    worker.
+    """
+    if is_booking(instance):
+        interval = (
+            instance.worker_id,
+            timestamp(instance.start_time),
+            timestamp(instance.end_time),
+        )
+        on_commit_if_loaded(
+            booking_index, lambda index: index.set_interval(instance.pk, *interval)
+        )
+    else:
+        on_commit_if_loaded(
+            booking_index, lambda index: index.remove_interval(instance.pk)
+        )
+
+
+@receiver(post_delete, sender=Task)
+def remove_task_from_booking_index(sender, instance, **kwargs):
+    pk = instance.pk
+    on_commit_if_loaded(booking_index, lambda index: index.remove_interval(pk))
+
+
+@receiver(post_save, sender=WorkerUnavailability)
+def update_unavailability_index(sender, instance, **kwargs):
+    interval = (
+        instance.worker_id,
+        timestamp(instance.start_time),
+        timestamp(instance.end_time),
+    )
+    on_commit_if_loaded(
+        unavailability_index,
+        lambda index: index.set_interval(instance.pk, *interval),
+    )
+
+
+@receiver(post_delete, sender=WorkerUnavailability)
+def remove_from_unavailability_index(sender, instance, **kwargs):
+    pk = instance.pk
+    on_commit_if_loaded(unavailability_index, lambda index: index.remove_interval(pk))
+
+
+@receiver(post_delete, sender=Worker)
+def remove_worker_from_booking_index(sender, instance, **kwargs):
+    """
+    Removes the tasks of a deleted worker from the booking index, as the tasks are
+    unassigned by an update that sends no signals.
+    """
+    pk = instance.pk
+    on_commit_if_loaded(booking_index, lambda index: index.remove_worker(pk))
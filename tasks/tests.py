@@ -1,3 +1,273 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone
 
-# Create your tests here.
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase
+
+from users.indexes import MAX_AGE
+from users.models import Customer, OutgoingEmail, Worker
+
+from . import availability
+from .availability import (
+    IntervalIndex,
+    double_bookings,
+    free_workers,
+    overlapping_tasks,
+)
+from .models import Task, WorkerUnavailability
+
+MONDAY = datetime(2026, 10, 12, tzinfo=timezone.utc)
+
+
+def hours(start, end):
+    return MONDAY + timedelta(hours=start), MONDAY + timedelta(hours=end)
+
+
+class IntervalIndexTests(SimpleTestCase):
+    def test_overlapping_matches_a_scan(self):
+        rng = np.random.default_rng(0)
+        starts = rng.integers(0, 10000, 500)
+        lengths = rng.integers(0, 2000, 500) ** rng.integers(1, 3, 500) // 100
+        intervals = {
+            i: (i % 20, int(start), int(start + length))
+            for i, (start, length) in enumerate(zip(starts, lengths))
+        }
+        index = IntervalIndex()
+        index.load((i, *interval) for i, interval in list(intervals.items())[:300])
+        for i, interval in list(intervals.items())[300:]:
+            index.set_interval(i, *interval)
+        for i in range(0, 500, 7):
+            index.remove_interval(i)
+            del intervals[i]
+
+        for start, end in rng.integers(0, 12000, (50, 2)):
+            start, end = min(start, end), max(start, end)
+            expected = {
+                i
+                for i, (_, a, b) in intervals.items()
+                if a < end and start < b and a < b
+            }
+            ids, workers = index.overlapping(start, end)
+            self.assertEqual(set(ids.tolist()), expected)
+            self.assertEqual(workers.tolist(), [intervals[i][0] for i in ids.tolist()])
+
+    def test_remove_worker(self):
+        index = IntervalIndex()
+        index.load([(1, 10, 0, 5), (2, 20, 0, 5), (3, 10, 2, 100)])
+
+        index.remove_worker(10)
+
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.overlapping(0, 10)[0].tolist(), [2])
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            username="customer", email="customer@example.com", phone_number="1"
+        )
+        self.workers = [
+            Worker.objects.create(
+                username=f"worker{i}",
+                email=f"worker{i}@example.com",
+                hourly_rate=10,
+                is_available=True,
+            )
+            for i in range(4)
+        ]
+
+    def tearDown(self):
+        availability._interval_indexes.clear()
+
+    def book(self, worker, start, end):
+        start_time, end_time = hours(start, end)
+        return Task.objects.create(
+            title="Task",
+            description="Task",
+            location="Home",
+            customer=self.customer,
+            worker=worker,
+            start_time=start_time,
+            end_time=end_time,
+            status="in-progress",
+        )
+
+    def test_free_workers(self):
+        w0, w1, w2, w3 = self.workers
+        self.book(w0, 9, 12)
+        WorkerUnavailability.objects.create(
+            worker=w1, start_time=MONDAY, end_time=MONDAY + timedelta(days=30)
+        )
+        Worker.objects.filter(id=w3.id).update(is_available=False)
+
+        self.assertEqual(free_workers(*hours(10, 11)), [w2.id])
+        self.assertEqual(free_workers(*hours(12, 13)), [w0.id, w2.id])
+        self.assertEqual(
+            free_workers(*hours(12, 13), worker_ids=[w3.id, w2.id, w1.id, w0.id]),
+            [w2.id, w0.id],
+        )
+
+    def test_signals_update_loaded_indexes(self):
+        w0, w1, w2, w3 = self.workers
+        self.assertEqual(len(free_workers(*hours(10, 11))), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task = self.book(w0, 9, 12)
+            unavailable = WorkerUnavailability.objects.create(
+                worker=w1, start_time=hours(10, 11)[0], end_time=hours(10, 11)[1]
+            )
+        self.assertEqual(free_workers(*hours(10, 11)), [w2.id, w3.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.status = "rejected"
+            task.save()
+            unavailable.delete()
+            w3.delete()
+        self.assertEqual(free_workers(*hours(10, 11)), [w0.id, w1.id, w2.id])
+
+    def test_indexes_are_reloaded_after_max_age(self):
+        w0, w1 = self.workers[:2]
+        self.assertEqual(len(free_workers(*hours(10, 11))), 4)
+        # Rows written by another process, which sends no signals here.
+        start_time, end_time = hours(9, 12)
+        Task.objects.bulk_create(
+            [
+                Task(
+                    title="Task",
+                    customer=self.customer,
+                    worker=w0,
+                    start_time=start_time,
+                    end_time=end_time,
+                    status="in-progress",
+                )
+            ]
+        )
+        WorkerUnavailability.objects.bulk_create(
+            [WorkerUnavailability(worker=w1, start_time=start_time, end_time=end_time)]
+        )
+        self.assertEqual(len(free_workers(*hours(10, 11))), 4)
+
+        self.addCleanup(setattr, availability._interval_indexes, "max_age", MAX_AGE)
+        availability._interval_indexes.max_age = 0
+        self.assertEqual(free_workers(*hours(10, 11)), [w.id for w in self.workers[2:]])
+
+    def test_clean_detects_double_booking(self):
+        w0 = self.workers[0]
+        booked = self.book(w0, 9, 12)
+        start_time, end_time = hours(11, 13)
+        task = Task(
+            title="Overlapping",
+            description="Overlapping",
+            location="Home",
+            customer=self.customer,
+            worker=w0,
+            start_time=start_time,
+            end_time=end_time,
+            status="in-progress",
+        )
+
+        with self.assertRaises(ValidationError) as raised:
+            task.full_clean()
+        self.assertIn("worker", raised.exception.message_dict)
+        overlapping = overlapping_tasks(w0.id, start_time, end_time)
+        self.assertEqual(list(overlapping), [booked])
+
+        task.start_time, task.end_time = hours(12, 13)
+        task.full_clean()
+        booked.full_clean()
+
+    def test_double_bookings(self):
+        w0, w1 = self.workers[:2]
+        tasks = Task.objects.bulk_create(
+            Task(
+                title="Task",
+                description="Task",
+                location="Home",
+                customer=self.customer,
+                worker=worker,
+                start_time=hours(start, end)[0],
+                end_time=hours(start, end)[1],
+                status=status,
+            )
+            for worker, start, end, status in [
+                (w0, 9, 17, "in-progress"),
+                (w0, 10, 11, "in-progress"),
+                (w0, 12, 13, "in-progress"),
+                (w0, 17, 18, "in-progress"),
+                (w1, 9, 10, "in-progress"),
+                (w1, 9, 10, "rejected"),
+            ]
+        )
+
+        self.assertEqual(
+            double_bookings(),
+            [(tasks[0].id, tasks[1].id), (tasks[0].id, tasks[2].id)],
+        )
+
+
+class NotificationTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(
+            username="customer", email="customer@example.com", phone_number="1"
+        )
+        worker = Worker.objects.create(
+            username="worker",
+            email="worker@example.com",
+            hourly_rate=10,
+            is_available=True,
+        )
+        start_time, end_time = hours(9, 12)
+        self.task = Task.objects.create(
+            title="Task",
+            customer=customer,
+            worker=worker,
+            start_time=start_time,
+            end_time=end_time,
+        )
+        OutgoingEmail.objects.all().delete()
+
+    def request(self, start, end):
+        start_time, end_time = hours(start, end)
+        task = Task.objects.create(
+            title="Request",
+            customer=self.task.customer,
+            worker=self.task.worker,
+            start_time=start_time,
+            end_time=end_time,
+            status="in-progress",
+        )
+        task.refresh_from_db()
+        return task
+
+    def test_requests_clashing_with_the_calendar_are_declined(self):
+        WorkerUnavailability.objects.create(
+            worker=self.task.worker,
+            start_time=hours(14, 16)[0],
+            end_time=hours(14, 16)[1],
+        )
+
+        for start, end in [(11, 13), (15, 17)]:
+            task = self.request(start, end)
+            self.assertEqual((task.worker, task.status), (None, "rejected"))
+        task = self.request(12, 14)
+        self.assertEqual((task.worker, task.status), (self.task.worker, "in-progress"))
+        self.assertEqual(
+            list(OutgoingEmail.objects.values_list("subject", flat=True)),
+            ["New task request", "Task request declined", "Task request status update"]
+            * 2
+            + ["New task request", "Task request accepted"],
+        )
+
+    def test_status_update_emails_only_on_change(self):
+        self.task.title = "Renamed"
+        self.task.save()
+        self.task.save(update_fields=["status"])
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+        self.task.status = "in-progress"
+        self.task.save()
+        self.task.save()
+        self.assertEqual(
+            list(OutgoingEmail.objects.values_list("subject", flat=True)),
+            ["Task request status update"],
+        )
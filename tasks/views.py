@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.shortcuts import render
 
 
@@ -33,7 +34,10 @@ class TaskCreateView(CreateView):
         task = form.save(commit=False)
         task.customer = self.request.user.customer
         task.status = Task.Status.REQUESTED
-        task.save()
+        # The notifications are queued by the post_save receivers of the task, and are
+        # only kept if the task is.
+        with transaction.atomic():
+            task.save()
         messages.success(self.request, "Task created successfully.")
         return super().form_valid(form)
 
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from users.models import Customer
+from users.outbox import enqueue_mail
 
 
 class CustomerAdmin(UserAdmin):
@@ -55,12 +57,15 @@ class CustomerAdmin(UserAdmin):
 
     def delete_model(self, request, obj):
         """
-        Deletes a customer account and sends a confirmation message.
+        Deletes a customer account and queues a confirmation email.
         """
-        obj.email_user(
-            "Account Deletion Notification", "Your account has been deleted."
-        )
-        obj.delete()
+        with transaction.atomic():
+            enqueue_mail(
+                "Account Deletion Notification",
+                "Your account has been deleted.",
+                [obj.email],
+            )
+            obj.delete()
         self.message_user(request, "The customer account has been deleted.")
 
     delete_model.short_description = "Delete selected customers"
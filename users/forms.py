@@ -1,8 +1,9 @@
 from django import forms
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
+from django.db import transaction
 from django.urls import reverse_lazy
 from .models import Customer, Worker
+from .outbox import enqueue_mail
 from django.contrib.auth.forms import AuthenticationForm
 
 User = get_user_model()
@@ -85,31 +86,30 @@ class WorkerRegistrationForm(forms.ModelForm):
         return username
 
     def save(self, commit=True):
-        user = super().save(commit=False)
-        user.is_worker = True
-        user.is_active = False
-        user.save()
-        worker = Worker.objects.create(
-            user=user,
-            phone_number=self.cleaned_data["phone_number"],
-            location=self.cleaned_data["location"],
-            skills=self.cleaned_data["skills"],
-            hourly_rate=self.cleaned_data["hourly_rate"],
-        )
-        send_mail(
-            subject="Verify your email",
-            message="Please click the link below to verify your email.",
-            from_email="noreply@freelancehouseholdwork.com",
-            recipient_list=[user.email],
-            fail_silently=False,
-        )
-        send_mail(
-            subject="New worker registration",
-            message="A new worker has registered on Freelance Household Work. Please log in to the admin panel to approve or reject the registration request.",
-            from_email="noreply@freelancehouseholdwork.com",
-            recipient_list=["admin@freelancehouseholdwork.com"],
-            fail_silently=False,
-        )
+        with transaction.atomic():
+            user = super().save(commit=False)
+            user.is_worker = True
+            user.is_active = False
+            user.save()
+            worker = Worker.objects.create(
+                user=user,
+                phone_number=self.cleaned_data["phone_number"],
+                location=self.cleaned_data["location"],
+                skills=self.cleaned_data["skills"],
+                hourly_rate=self.cleaned_data["hourly_rate"],
+            )
+            enqueue_mail(
+                subject="Verify your email",
+                message="Please click the link below to verify your email.",
+                from_email="noreply@freelancehouseholdwork.com",
+                recipient_list=[user.email],
+            )
+            enqueue_mail(
+                subject="New worker registration",
+                message="A new worker has registered on Freelance Household Work. Please log in to the admin panel to approve or reject the registration request.",
+                from_email="noreply@freelancehouseholdwork.com",
+                recipient_list=["admin@freelancehouseholdwork.com"],
+            )
         return user
 
 
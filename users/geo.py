@@ -0,0 +1,218 @@
+import csv
+import math
+import threading
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+
+from .indexes import CHUNK_SIZE, IndexRegistry
+from .models import Worker
+
+# Mean radius of the Earth, in km.
+EARTH_RADIUS = 6371.0088
+
+# Size of the cells of the grid index, in degrees of latitude and longitude (about 11
+# km of latitude).
+CELL_DEGREES = 0.1
+
+# Process-local grid index of the workers, loaded on first use and kept up to date by
+# the receivers in signals.py.
+_grid_indexes = IndexRegistry()
+
+# Gazetteers read so far, by path. They are files, so they are never reloaded.
+_gazetteers = IndexRegistry(max_age=None)
+
+
+def normalize(name):
+    """
+    returns a place name in the form it is looked up in the gazetteer.
+    """
+    return " ".join(name.casefold().split())
+
+
+def gazetteer(path=None):
+    """
+    returns the gazetteer at path (settings.GAZETTEER_PATH by default) as a dict
+    mapping normalized place names to (latitude, longitude) pairs. The file is a CSV
+    with name, latitude and longitude columns, and is read once per process; a missing
+    file is an empty gazetteer.
+    """
+    path = str(path or settings.GAZETTEER_PATH)
+    return _gazetteers.get(path, lambda: _read_gazetteer(path))
+
+
+def _read_gazetteer(path):
+    places = {}
+    try:
+        with open(path, newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                coordinates = float(row["latitude"]), float(row["longitude"])
+                places.setdefault(normalize(row["name"]), coordinates)
+    except FileNotFoundError:
+        pass
+    return places
+
+
+def geocode(location):
+    """
+    returns the (latitude, longitude) of a free-text location from the gazetteer, or
+    (None, None) if it is not in it. "Place, Region" locations that are not in the
+    gazetteer as a whole are looked up by their first part.
+    """
+    places = gazetteer()
+    name = normalize(location or "")
+    if name in places:
+        return places[name]
+    return places.get(name.split(",")[0].strip(), (None, None))
+
+
+def haversine(latitude, longitude, latitudes, longitudes):
+    """
+    returns the great-circle distances in km from a point to arrays of points.
+    """
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+class GridIndex:
+    """
+    A process-local index of the coordinates of workers, bucketed into cells of
+    CELL_DEGREES by CELL_DEGREES, so that finding the workers within a radius of a point
+    only reads the cells of the bounding box of the circle, and computes distances for
+    the workers in them.
+    """
+
+    def __init__(self, cell_degrees=CELL_DEGREES):
+        self.lock = threading.RLock()
+        self.cell_degrees = cell_degrees
+        self.n_columns = math.ceil(360 / cell_degrees)
+        self.load([])
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, worker_id):
+        return worker_id in self.points
+
+    def load(self, workers):
+        """
+        replaces the contents of the index with workers, given as (worker_id,
+        latitude, longitude) rows. Workers without coordinates are left out.
+        """
+        with self.lock:
+            self.points = {}
+            self.cells = defaultdict(set)
+            for worker_id, latitude, longitude in workers:
+                self.set_worker(worker_id, latitude, longitude)
+
+    def set_worker(self, worker_id, latitude, longitude):
+        """
+        adds a worker to the index, or moves it. A worker without coordinates is
+        removed.
+        """
+        with self.lock:
+            self.remove_worker(worker_id)
+            if latitude is None or longitude is None:
+                return
+            self.points[worker_id] = (latitude, longitude)
+            self.cells[self._cell(latitude, longitude)].add(worker_id)
+
+    def remove_worker(self, worker_id):
+        with self.lock:
+            point = self.points.pop(worker_id, None)
+            if point is None:
+                return
+            cell = self._cell(*point)
+            self.cells[cell].discard(worker_id)
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def within(self, latitude, longitude, radius):
+        """
+        returns the ids of the workers within radius km of the point and their
+        distances, ordered by distance and then by worker id.
+        """
+        with self.lock:
+            worker_ids = [
+                worker_id
+                for cell in self._cells_around(latitude, longitude, radius)
+                for worker_id in self.cells.get(cell, ())
+            ]
+            points = np.array(
+                [self.points[worker_id] for worker_id in worker_ids], dtype=float
+            ).reshape(-1, 2)
+        worker_ids = np.array(worker_ids, dtype=np.int64)
+        distances = haversine(latitude, longitude, points[:, 0], points[:, 1])
+        selected = distances <= radius
+        worker_ids, distances = worker_ids[selected], distances[selected]
+        order = np.lexsort((worker_ids, distances))
+        return worker_ids[order], distances[order]
+
+    def _cell(self, latitude, longitude):
+        return (
+            math.floor(latitude / self.cell_degrees),
+            math.floor(longitude / self.cell_degrees) % self.n_columns,
+        )
+
+    def _cells_around(self, latitude, longitude, radius):
+        """
+        returns the cells of the bounding box of the circle of radius km around the
+        point, or the occupied cells if there are fewer of them.
+        """
+        degrees = math.degrees(radius / EARTH_RADIUS)
+        south, north = max(latitude - degrees, -90), min(latitude + degrees, 90)
+        if north >= 90 or south <= -90:
+            # The circle contains a pole, so it spans every longitude.
+            west, east = -180, 180
+        else:
+            # The widest point of a circle that does not contain a pole.
+            sine = math.sin(math.radians(degrees)) / math.cos(math.radians(latitude))
+            half_width = math.degrees(math.asin(min(sine, 1)))
+            west, east = longitude - half_width, longitude + half_width
+        rows = range(
+            math.floor(south / self.cell_degrees),
+            math.floor(north / self.cell_degrees) + 1,
+        )
+        columns = range(
+            math.floor(west / self.cell_degrees),
+            min(
+                math.floor(east / self.cell_degrees) + 1,
+                math.floor(west / self.cell_degrees) + self.n_columns,
+            ),
+        )
+        if len(rows) * len(columns) > len(self.cells):
+            return list(self.cells)
+        return [(row, column % self.n_columns) for row in rows for column in columns]
+
+
+def worker_grid_index(load=True):
+    """
+    returns the process-local GridIndex of the coordinates of every worker, loading it
+    from the database on first use. With load=False it returns None instead if the
+    index has not been loaded yet.
+    """
+
+    def load_grid_index():
+        index = GridIndex()
+        index.load(
+            Worker.objects.filter(latitude__isnull=False)
+            .values_list("id", "latitude", "longitude")
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        return index
+
+    return _grid_indexes.get("workers", load_grid_index, load)
+
+
+def workers_within(latitude, longitude, radius):
+    """
+    returns the ids of the workers within radius km of the point, and their distances,
+    nearest first.
+    """
+    return worker_grid_index().within(latitude, longitude, radius)
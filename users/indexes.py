@@ -0,0 +1,73 @@
+import threading
+import time
+
+from django.db import transaction
+
+# Number of rows fetched from the database cursor at once when loading an index.
+CHUNK_SIZE = 10000
+
+# Number of seconds after which an index is loaded again on its next use. Receivers
+# only keep an index up to date with the changes made in its own process, so this
+# bounds how long it misses those made by other processes, management commands and
+# queryset updates.
+MAX_AGE = 60
+
+
+class IndexRegistry:
+    """
+    A registry of process-local indexes, each loaded from the database on first use,
+    kept up to date by signal receivers with on_commit_if_loaded, and loaded again on
+    the first use after max_age seconds (never if max_age is None).
+    """
+
+    def __init__(self, max_age=MAX_AGE):
+        self.lock = threading.Lock()
+        self.max_age = max_age
+        self.indexes = {}
+        self.load_times = {}
+
+    def get(self, name, load_index, load=True):
+        """
+        returns the named index, creating it with load_index() on first use, or when it
+        is older than max_age, if load. With load=False it returns None instead if the
+        index has not been loaded yet.
+        """
+        with self.lock:
+            if load and (name not in self.indexes or self.expired(name)):
+                self.indexes[name] = load_index()
+                self.load_times[name] = time.monotonic()
+            return self.indexes.get(name)
+
+    def expired(self, name):
+        """
+        returns whether the named index was loaded more than max_age seconds ago.
+        """
+        if self.max_age is None:
+            return False
+        return time.monotonic() - self.load_times[name] > self.max_age
+
+    def clear(self):
+        """
+        forgets every index, so each is loaded again on its next use.
+        """
+        with self.lock:
+            self.indexes.clear()
+            self.load_times.clear()
+
+
+def on_commit_if_loaded(get_index, update):
+    """
+    calls update(index) with the index returned by get_index(load=False) once the
+    current transaction commits, if the index has been loaded in this process by then;
+    an index loaded later reads the committed rows anyway.
+
+    update runs after the transaction commits, when a deleted instance no longer has
+    its pk, so it must not read the instance's pk; bind the pk to a variable first.
+    """
+
+    def update_if_loaded():
+        index = get_index(load=False)
+        if index is not None:
+            update(index)
+
+    transaction.on_commit(update_if_loaded)
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from tasks.models import Task
+from users.geo import CHUNK_SIZE, geocode
+from users.models import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Geocodes the locations of every worker and task from the gazetteer and "
+        "stores their coordinates, for rows saved before the gazetteer was in place."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="number of rows read and updated per query",
+        )
+
+    def handle(self, *args, **options):
+        for model in (Worker, Task):
+            n_geocoded, n_unknown = geocode_locations(model, options["batch_size"])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Geocoded {n_geocoded} {model._meta.verbose_name_plural.lower()}, "
+                    f"{n_unknown} with locations not in the gazetteer."
+                )
+            )
+
+
+def geocode_locations(model, batch_size):
+    """
+    stores the geocoded coordinates of every row of model, batch_size rows at a time,
+    and returns how many were found in the gazetteer and how many were not.
+    """
+    n_geocoded = n_unknown = 0
+    rows = model.objects.only("id", "location", "latitude", "longitude").order_by("id")
+    last_id = 0
+    while batch := list(rows.filter(id__gt=last_id)[:batch_size]):
+        for row in batch:
+            row.latitude, row.longitude = geocode(row.location)
+            if row.latitude is None:
+                n_unknown += 1
+            else:
+                n_geocoded += 1
+        model.objects.bulk_update(batch, ["latitude", "longitude"])
+        last_id = batch[-1].id
+    return n_geocoded, n_unknown
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from tasks.models import Task
+from users.ratings import reconcile_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the rating_count and rating_sum of every worker from the ratings "
+        "of its tasks, repairing drift left by bulk updates and deletes that send no "
+        "signals."
+    )
+
+    def handle(self, *args, **options):
+        n_repaired = reconcile_rating_aggregates([Task.objects.all()])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Repaired the rating aggregates of {n_repaired} workers."
+            )
+        )
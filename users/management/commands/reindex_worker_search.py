@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.search import reindex_workers
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the full-text search index of the names, skills and locations of "
+        "every worker, for changes made without signals such as bulk updates."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            n_workers = reindex_workers()
+        self.stdout.write(
+            self.style.SUCCESS(f"Reindexed the search rows of {n_workers} workers.")
+        )
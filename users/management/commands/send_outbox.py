@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.outbox import BATCH_SIZE, send_outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends the queued OutgoingEmail rows that are due in batches over one "
+        "connection, retrying failures with backoff. With --interval it keeps polling "
+        "the outbox instead of exiting once it is empty."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="number of emails claimed and sent at once",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="seconds to wait between polls of the outbox; runs once if not given",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            n_sent, n_failed = send_outbox(batch_size=options["batch_size"])
+            if n_sent or n_failed or options["interval"] is None:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Sent {n_sent} emails, {n_failed} failed.")
+                )
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-16 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='worker',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='worker',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
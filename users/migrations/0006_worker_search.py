@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+# Creates the FTS5 table searched by users.search, with indexes of two and three
+# character prefixes, and fills it with the existing workers.
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0005_worker_coordinates"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                """
+                CREATE VIRTUAL TABLE users_worker_search USING fts5(
+                    name,
+                    skills,
+                    location,
+                    tokenize = 'unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                )
+                """,
+                """
+                INSERT INTO users_worker_search (rowid, name, skills, location)
+                SELECT
+                    worker.user_ptr_id,
+                    user.first_name || ' ' || user.last_name,
+                    (
+                        SELECT group_concat(skill.name, ' ')
+                        FROM users_worker_skills worker_skill
+                        JOIN users_skill skill ON skill.id = worker_skill.skill_id
+                        WHERE worker_skill.worker_id = worker.user_ptr_id
+                    ),
+                    worker.location
+                FROM users_worker worker
+                JOIN users_user user ON user.id = worker.user_ptr_id
+                """,
+            ],
+            reverse_sql="DROP TABLE users_worker_search",
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_worker_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='worker',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='worker',
+            name='rating_sum',
+            field=models.FloatField(default=0),
+        ),
+    ]
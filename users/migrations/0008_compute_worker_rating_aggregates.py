@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def compute_rating_aggregates(apps, schema_editor):
+    Worker = apps.get_model("users", "Worker")
+    Task = apps.get_model("tasks", "Task")
+    # Ratings rows refer to auth.User, not to workers, so only task ratings count.
+    rows = (
+        Task.objects.filter(worker__isnull=False, rating__isnull=False)
+        .values("worker_id")
+        .annotate(count=Count("rating"), total=Sum("rating"))
+        .values_list("worker_id", "count", "total")
+    )
+    aggregates = {worker_id: (count, total) for worker_id, count, total in rows}
+    workers = list(Worker.objects.filter(pk__in=aggregates))
+    for worker in workers:
+        worker.rating_count, worker.rating_sum = aggregates[worker.pk]
+    Worker.objects.bulk_update(workers, ["rating_count", "rating_sum"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0003_task_coordinates"),
+        ("users", "0007_worker_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.RunPython(compute_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.db import models
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -42,14 +43,62 @@ class Worker(User):
     hourly_rate = models.FloatField()
     email_verified = models.BooleanField(default=False)
     is_available = models.BooleanField(default=False)
+    # Coordinates of location, geocoded from the gazetteer when the worker is saved.
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Number and sum of the ratings of the tasks of the worker, kept up to date by
+    # users.ratings. Ratings rows refer to auth.User rather than to workers, so they
+    # are not counted.
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.FloatField(default=0)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else 0.0
+
     def save(self, *args, **kwargs):
+        from .geo import geocode
+
         self.is_customer = False
+        self.latitude, self.longitude = geocode(self.location)
         super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = "Worker"
         verbose_name_plural = "Workers"
+
+
+class OutgoingEmail(models.Model):
+    """
+    An email queued for delivery by the send_outbox command. Messages are queued in the
+    transaction of the change they report, so they are sent only if it commits, and
+    requests do not wait for the mail server.
+    """
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, null=True, blank=True)
+    recipients = models.JSONField()
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ("pending", "Pending"),
+            ("sent", "Sent"),
+            ("failed", "Failed"),
+        ],
+        default="pending",
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_time = models.DateTimeField(default=timezone.now)
+    created_time = models.DateTimeField(auto_now_add=True)
+    sent_time = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_time"])]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)}"
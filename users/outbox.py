@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+# Number of queued emails claimed and sent at once.
+BATCH_SIZE = 100
+
+# Number of failed attempts after which an email is given up on.
+MAX_ATTEMPTS = 5
+
+# Delay before the first retry of a failed email, doubled after every further failure
+# up to MAX_BACKOFF.
+BACKOFF = timedelta(minutes=1)
+MAX_BACKOFF = timedelta(hours=1)
+
+# Time for which claimed emails are hidden from other workers while they are sent.
+LEASE = timedelta(minutes=10)
+
+
+def enqueue_mail(subject, message, recipient_list, from_email=None):
+    """
+    queues an email for the send_outbox command, in the current transaction if there is
+    one, and returns the OutgoingEmail. Takes the arguments of send_mail.
+    """
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email,
+        recipients=list(recipient_list),
+    )
+
+
+def send_outbox(batch_size=BATCH_SIZE, connection=None):
+    """
+    sends the queued emails that are due, batch_size at a time over one connection of
+    the email backend (get_connection() by default), and returns how many were sent and
+    how many failed.
+
+    Each batch is claimed by pushing its next attempt LEASE into the future, so workers
+    running at the same time do not send the same email. A failed email is retried after
+    BACKOFF, doubled after every failure, and marked failed after MAX_ATTEMPTS attempts.
+    """
+    connection = connection or get_connection()
+    n_sent = n_failed = 0
+    with connection:
+        while batch := _claim(batch_size):
+            sent, failed = [], []
+            for email in batch:
+                try:
+                    # Reopens the connection if the previous email closed it.
+                    connection.open()
+                    connection.send_messages([_message(email, connection)])
+                except Exception as e:
+                    email.last_error = f"{type(e).__name__}: {e}"
+                    failed.append(email)
+                    # The next email reopens the connection in case this one broke.
+                    connection.close()
+                else:
+                    sent.append(email)
+            _record(sent, failed)
+            n_sent += len(sent)
+            n_failed += len(failed)
+    return n_sent, n_failed
+
+
+def backoff(attempts):
+    """
+    returns the delay before the next attempt of an email that failed attempts times.
+    """
+    return min(BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def _claim(batch_size):
+    """
+    returns up to batch_size due emails, oldest first, leased to the caller.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", next_attempt_time__lte=now)
+            .order_by("next_attempt_time", "id")[:batch_size]
+        )
+        OutgoingEmail.objects.filter(id__in=[email.id for email in batch]).update(
+            next_attempt_time=now + LEASE
+        )
+    return batch
+
+
+def _message(email, connection):
+    return EmailMessage(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.recipients,
+        connection=connection,
+    )
+
+
+def _record(sent, failed):
+    """
+    records the outcome of sending a batch.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        OutgoingEmail.objects.filter(id__in=[email.id for email in sent]).update(
+            status="sent", sent_time=now, last_error=""
+        )
+        for email in failed:
+            email.attempts += 1
+            if email.attempts >= MAX_ATTEMPTS:
+                email.status = "failed"
+            email.next_attempt_time = now + backoff(email.attempts)
+        OutgoingEmail.objects.bulk_update(
+            failed, ["attempts", "status", "last_error", "next_attempt_time"]
+        )
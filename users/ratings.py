@@ -0,0 +1,69 @@
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from .models import Worker
+
+# Fields of the rated models that the aggregates depend on, as save() update_fields.
+RATED_FIELDS = {"worker", "worker_id", "rating"}
+
+
+def update_rating_aggregates(old, new):
+    """
+    applies the change of a rating from old to new, both (worker_id, rating) pairs
+    with None for no rating, to the rating_count and rating_sum of the workers, with F()
+    expressions so that concurrent changes add up.
+
+    The aggregates are kept from going below zero, as removing a rating that was never
+    counted (one saved by bulk_create or a queryset update, which send no signals)
+    would otherwise break the check constraint of rating_count; reconcile_ratings
+    repairs what such writes leave behind.
+    """
+    changes = defaultdict(lambda: [0, 0.0])
+    for (worker_id, rating), sign in ((old, -1), (new, 1)):
+        if worker_id is not None and rating is not None:
+            changes[worker_id][0] += sign
+            changes[worker_id][1] += sign * rating
+    for worker_id, (count, total) in changes.items():
+        if count or total:
+            Worker.objects.filter(pk=worker_id).update(
+                rating_count=Greatest(F("rating_count") + count, 0),
+                rating_sum=Greatest(F("rating_sum") + total, 0.0),
+            )
+
+
+def reconcile_rating_aggregates(querysets):
+    """
+    recomputes the rating_count and rating_sum of every worker from the querysets of
+    rated models, stores those that drifted, and returns how many did.
+    """
+    aggregates = defaultdict(lambda: [0, 0.0])
+    for queryset in querysets:
+        rows = (
+            queryset.order_by()
+            .filter(worker__isnull=False, rating__isnull=False)
+            .values("worker_id")
+            .annotate(count=Count("rating"), total=Sum("rating"))
+            .values_list("worker_id", "count", "total")
+        )
+        for worker_id, count, total in rows:
+            aggregates[worker_id][0] += count
+            aggregates[worker_id][1] += total
+
+    drifted = []
+    with transaction.atomic():
+        workers = Worker.objects.select_for_update().only(
+            "id", "rating_count", "rating_sum"
+        )
+        for worker in workers.iterator():
+            count, total = aggregates.get(worker.pk, (0, 0.0))
+            if worker.rating_count != count or not math.isclose(
+                worker.rating_sum, total, abs_tol=1e-9
+            ):
+                worker.rating_count, worker.rating_sum = count, total
+                drifted.append(worker)
+        Worker.objects.bulk_update(drifted, ["rating_count", "rating_sum"])
+    return len(drifted)
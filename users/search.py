@@ -0,0 +1,100 @@
+import re
+
+from django.db import connection
+
+# FTS5 virtual table of the searchable text of every worker, keyed by worker id. It is
+# created by migration 0006 and kept up to date by the receivers in signals.py.
+SEARCH_TABLE = "users_worker_search"
+
+# BM25 weights of the name, skills and location columns of SEARCH_TABLE.
+COLUMN_WEIGHTS = (2.0, 4.0, 1.0)
+
+# Number of results returned by a search.
+RESULTS = 20
+
+# Number of workers reindexed per query, below SQLite's limit on query parameters.
+BATCH_SIZE = 500
+
+# Rows of SEARCH_TABLE for the workers selected by the WHERE clause appended to it.
+_SEARCH_ROWS = """
+    INSERT INTO users_worker_search (rowid, name, skills, location)
+    SELECT
+        worker.user_ptr_id,
+        user.first_name || ' ' || user.last_name,
+        (
+            SELECT group_concat(skill.name, ' ')
+            FROM users_worker_skills worker_skill
+            JOIN users_skill skill ON skill.id = worker_skill.skill_id
+            WHERE worker_skill.worker_id = worker.user_ptr_id
+        ),
+        worker.location
+    FROM users_worker worker
+    JOIN users_user user ON user.id = worker.user_ptr_id
+"""
+
+
+def match_query(text):
+    """
+    returns an FTS5 query matching the workers whose text has every word of text as a
+    prefix of one of its words, or None if text has no words. Only the words of text
+    are kept, so it cannot inject FTS5 syntax.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_workers(text, limit=RESULTS):
+    """
+    returns the ids of the limit workers (or of every matching worker if limit is None)
+    that best match the search text, with their BM25 scores, highest first.
+    """
+    query = match_query(text)
+    if query is None:
+        return []
+    if limit is None:
+        # SQLite reads a negative LIMIT as no limit.
+        limit = -1
+    weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, -bm25({SEARCH_TABLE}, {weights}) AS score "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+            f"ORDER BY score DESC, rowid LIMIT %s",
+            [query, limit],
+        )
+        return cursor.fetchall()
+
+
+def index_workers(worker_ids):
+    """
+    replaces the search rows of the workers by their current name, skills and
+    location, and removes those of workers that no longer exist.
+    """
+    worker_ids = list(worker_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(worker_ids), BATCH_SIZE):
+            batch = worker_ids[start : start + BATCH_SIZE]
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", batch
+            )
+            cursor.execute(
+                f"{_SEARCH_ROWS} WHERE worker.user_ptr_id IN ({placeholders})", batch
+            )
+
+
+def reindex_workers():
+    """
+    rebuilds the search rows of every worker and merges the index into one segment,
+    and returns the number of workers indexed.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(_SEARCH_ROWS)
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')"
+        )
+        cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
@@ -0,0 +1,73 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .geo import worker_grid_index
+from .indexes import on_commit_if_loaded
+from .models import Skill, Worker
+from .search import index_workers
+
+
+@receiver(post_save, sender=Worker)
+def update_worker_in_grid_index(sender, instance, **kwargs):
+    """
+    moves a saved worker to the cell of its coordinates in the grid index, once the
+    transaction commits, if the index has been loaded in this process.
+    """
+    point = (instance.pk, instance.latitude, instance.longitude)
+    on_commit_if_loaded(worker_grid_index, lambda index: index.set_worker(*point))
+
+
+@receiver(post_delete, sender=Worker)
+def remove_worker_from_grid_index(sender, instance, **kwargs):
+    pk = instance.pk
+    on_commit_if_loaded(worker_grid_index, lambda index: index.remove_worker(pk))
+
+
+@receiver(post_save, sender=Worker)
+@receiver(post_delete, sender=Worker)
+def update_worker_search(sender, instance, **kwargs):
+    """
+    reindexes the search row of a saved or deleted worker, in the same transaction.
+    """
+    index_workers([instance.pk])
+
+
+@receiver(m2m_changed, sender=Worker.skills.through)
+def update_skills_search(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    reindexes the search rows of the workers whose skills changed, from either side of
+    the relation.
+    """
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            index_workers([instance.pk])
+    elif action == "pre_clear":
+        instance._search_worker_ids = list(
+            instance.worker_set.values_list("pk", flat=True)
+        )
+    elif action == "post_clear":
+        index_workers(instance._search_worker_ids)
+    elif action in ("post_add", "post_remove"):
+        index_workers(pk_set)
+
+
+@receiver(post_save, sender=Skill)
+def update_skill_search(sender, instance, created, **kwargs):
+    """
+    reindexes the search rows of the workers with a renamed skill.
+    """
+    if not created:
+        index_workers(instance.worker_set.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Skill)
+def remember_skill_workers(sender, instance, **kwargs):
+    instance._search_worker_ids = list(instance.worker_set.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Skill)
+def update_deleted_skill_search(sender, instance, **kwargs):
+    """
+    reindexes the search rows of the workers that had a deleted skill.
+    """
+    index_workers(getattr(instance, "_search_worker_ids", ()))
@@ -1,3 +1,303 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+import numpy as np
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from recommendation_algorithm import loaders
+
+from . import geo
+from .geo import GridIndex, geocode, haversine, workers_within
+from .models import OutgoingEmail, Skill, Worker
+from .outbox import BACKOFF, MAX_ATTEMPTS, enqueue_mail, send_outbox
+from .search import match_query, search_workers
+
+
+class FailingEmailBackend(EmailBackend):
+    """
+    a locmem backend that fails to send to the given addresses and counts the
+    connections it opens.
+    """
+
+    def __init__(self, failing=(), **kwargs):
+        super().__init__(**kwargs)
+        self.failing = set(failing)
+        self.n_opened = 0
+        self.is_open = False
+
+    def open(self):
+        if not self.is_open:
+            self.is_open = True
+            self.n_opened += 1
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.failing & set(message.to):
+                raise ConnectionError("refused")
+        return super().send_messages(messages)
+
+
+class OutboxTests(TestCase):
+    def test_enqueue_mail_joins_the_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                enqueue_mail("Rolled back", "body", ["a@example.com"])
+                raise RuntimeError
+        enqueue_mail("Committed", "body", ["b@example.com"])
+
+        self.assertEqual(
+            list(OutgoingEmail.objects.values_list("subject", flat=True)),
+            ["Committed"],
+        )
+        self.assertEqual(mail.outbox, [])
+
+    def test_send_outbox_sends_in_batches_over_one_connection(self):
+        for i in range(5):
+            enqueue_mail(f"Subject {i}", "body", [f"user{i}@example.com"])
+        connection = FailingEmailBackend()
+
+        self.assertEqual(send_outbox(batch_size=2, connection=connection), (5, 0))
+        self.assertEqual(connection.n_opened, 1)
+        self.assertEqual(
+            [message.subject for message in mail.outbox],
+            [f"Subject {i}" for i in range(5)],
+        )
+        self.assertFalse(OutgoingEmail.objects.exclude(status="sent").exists())
+        self.assertEqual(send_outbox(connection=connection), (0, 0))
+
+    def test_send_outbox_retries_failures_with_backoff(self):
+        enqueue_mail("Fails", "body", ["down@example.com"])
+        enqueue_mail("Sent", "body", ["up@example.com"])
+        connection = FailingEmailBackend(failing=["down@example.com"])
+
+        self.assertEqual(send_outbox(connection=connection), (1, 1))
+        self.assertEqual([message.subject for message in mail.outbox], ["Sent"])
+        email = OutgoingEmail.objects.get(subject="Fails")
+        self.assertEqual((email.status, email.attempts), ("pending", 1))
+        self.assertIn("refused", email.last_error)
+        self.assertGreater(email.next_attempt_time, timezone.now())
+        # Not due again until the backoff has passed.
+        self.assertEqual(send_outbox(connection=connection), (0, 0))
+
+        for attempts in range(2, MAX_ATTEMPTS + 1):
+            OutgoingEmail.objects.update(next_attempt_time=timezone.now())
+            self.assertEqual(send_outbox(connection=connection), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("failed", MAX_ATTEMPTS))
+        self.assertGreater(
+            email.next_attempt_time, timezone.now() + BACKOFF * 2 ** (MAX_ATTEMPTS - 2)
+        )
+
+    def test_send_outbox_command(self):
+        enqueue_mail("Queued", "body", ["a@example.com"])
+        later = enqueue_mail("Later", "body", ["b@example.com"])
+        later.next_attempt_time = timezone.now() + timedelta(hours=1)
+        later.save()
+
+        call_command("send_outbox", stdout=StringIO())
+
+        self.assertEqual([message.subject for message in mail.outbox], ["Queued"])
+
+
+GAZETTEER = """name,latitude,longitude
+Helsinki,60.1699,24.9384
+Espoo,60.2055,24.6559
+Tampere,61.4978,23.7610
+Vantaa,60.2934,25.0378
+"""
+
+
+class GeoTests(TestCase):
+    def setUp(self):
+        gazetteer = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False)
+        with gazetteer:
+            gazetteer.write(GAZETTEER)
+        self.addCleanup(os.remove, gazetteer.name)
+        settings = override_settings(GAZETTEER_PATH=gazetteer.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def tearDown(self):
+        geo._gazetteers.clear()
+        geo._grid_indexes.clear()
+
+    def create_worker(self, name, location):
+        return Worker.objects.create(
+            username=name,
+            email=f"{name}@example.com",
+            location=location,
+            hourly_rate=10,
+        )
+
+    def test_geocode(self):
+        self.assertEqual(geocode("  helsinki "), (60.1699, 24.9384))
+        self.assertEqual(geocode("Espoo, Uusimaa"), (60.2055, 24.6559))
+        self.assertEqual(geocode("Atlantis"), (None, None))
+        self.assertEqual(geocode(""), (None, None))
+
+    def test_within_matches_a_scan(self):
+        rng = np.random.default_rng(0)
+        points = np.column_stack(
+            [rng.uniform(-90, 90, 2000), rng.uniform(-180, 180, 2000)]
+        )
+        points[:500] = rng.normal([60, 179.9], 0.5, (500, 2))
+        points[:500, 1] = (points[:500, 1] + 180) % 360 - 180
+        points[500:700] = rng.uniform([88, -180], [90, 180], (200, 2))
+        index = GridIndex(cell_degrees=0.5)
+        index.load((i, lat, lon) for i, (lat, lon) in enumerate(points.tolist()))
+
+        for latitude, longitude, radius in [
+            (60, 179.9, 50),
+            (60, -179.9, 120),
+            (89.5, 0, 300),
+            (0, 0, 2000),
+            (-30, 45, 0.1),
+        ]:
+            distances = haversine(latitude, longitude, points[:, 0], points[:, 1])
+            expected = np.flatnonzero(distances <= radius)
+            expected = expected[np.lexsort((expected, distances[expected]))]
+            worker_ids, found = index.within(latitude, longitude, radius)
+            self.assertEqual(worker_ids.tolist(), expected.tolist())
+            np.testing.assert_allclose(found, distances[expected])
+
+    def test_workers_within_follows_saved_locations(self):
+        helsinki = self.create_worker("helsinki", "Helsinki")
+        espoo = self.create_worker("espoo", "Espoo")
+        tampere = self.create_worker("tampere", "Tampere")
+        self.assertEqual((tampere.latitude, tampere.longitude), (61.4978, 23.761))
+
+        worker_ids, distances = workers_within(60.17, 24.94, 30)
+        self.assertEqual(worker_ids.tolist(), [helsinki.pk, espoo.pk])
+        self.assertLess(distances[0], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tampere.location = "Vantaa"
+            tampere.save()
+            helsinki_id = helsinki.pk
+            helsinki.delete()
+        worker_ids, _ = workers_within(60.17, 24.94, 30)
+        self.assertEqual(worker_ids.tolist(), [tampere.pk, espoo.pk])
+        self.assertNotIn(helsinki_id, geo.worker_grid_index())
+
+    def test_geocode_locations_command(self):
+        worker = self.create_worker("worker", "Tampere")
+        Worker.objects.filter(pk=worker.pk).update(latitude=None, longitude=None)
+        self.create_worker("nowhere", "Atlantis")
+
+        output = StringIO()
+        call_command("geocode_locations", stdout=output)
+
+        worker.refresh_from_db()
+        self.assertEqual((worker.latitude, worker.longitude), (61.4978, 23.761))
+        self.assertIn("Geocoded 1 workers, 1 with", output.getvalue())
+
+
+class WorkerSearchTests(TestCase):
+    def setUp(self):
+        self.cleaning, self.gardening, self.plumbing = [
+            Skill.objects.create(name=name)
+            for name in ("House cleaning", "Gardening", "Plumbing")
+        ]
+        self.anna = self.create_worker("Anna", "Virtanen", "Helsinki")
+        self.anna.skills.add(self.cleaning, self.gardening)
+        self.ben = self.create_worker("Ben", "Cleaver", "Espoo")
+        self.ben.skills.add(self.plumbing)
+        self.cleo = self.create_worker("Cleo", "Korhonen", "Helsinki")
+
+    def create_worker(self, first_name, last_name, location):
+        return Worker.objects.create(
+            username=first_name,
+            email=f"{first_name}@example.com",
+            first_name=first_name,
+            last_name=last_name,
+            location=location,
+            hourly_rate=10,
+        )
+
+    def search(self, text):
+        return [worker_id for worker_id, _ in search_workers(text)]
+
+    def test_match_query(self):
+        self.assertEqual(match_query("house CLEAN"), '"house"* "CLEAN"*')
+        self.assertEqual(match_query('"a" OR b*'), '"a"* "OR"* "b"*')
+        self.assertIsNone(match_query("  *()"))
+
+    def test_prefix_matching_and_ranking(self):
+        self.assertEqual(self.search("clea"), [self.anna.pk, self.ben.pk])
+        self.assertEqual(self.search("helsinki gard"), [self.anna.pk])
+        self.assertEqual(
+            sorted(self.search("helsinki")), sorted([self.anna.pk, self.cleo.pk])
+        )
+        self.assertEqual(self.search("nothing"), [])
+        self.assertEqual(self.search("AND OR"), [])
+
+    def test_signals_keep_index_in_sync(self):
+        self.cleo.skills.add(self.plumbing)
+        self.assertEqual(self.search("plumb"), [self.ben.pk, self.cleo.pk])
+        self.plumbing.worker_set.clear()
+        self.assertEqual(self.search("plumb"), [])
+
+        self.gardening.name = "Landscaping"
+        self.gardening.save()
+        self.assertEqual(self.search("landsc"), [self.anna.pk])
+        self.cleaning.delete()
+        self.assertEqual(self.search("cleaning"), [])
+
+        self.cleo.location = "Tampere"
+        self.cleo.save()
+        self.assertEqual(self.search("tampere"), [self.cleo.pk])
+        anna_id = self.anna.pk
+        self.anna.delete()
+        self.assertNotIn(anna_id, self.search("helsinki"))
+
+    def test_reindex_command(self):
+        Worker.objects.filter(pk=self.cleo.pk).update(location="Oulu")
+        self.assertEqual(self.search("oulu"), [])
+
+        call_command("reindex_worker_search", stdout=StringIO())
+
+        self.assertEqual(self.search("oulu"), [self.cleo.pk])
+
+    def test_worker_search_view(self):
+        response = self.client.get("/users/workers/search/", {"q": "house clean"})
+
+        self.assertEqual(response.status_code, 200)
+        (result,) = response.json()["results"]
+        self.assertEqual(result["id"], self.anna.pk)
+        self.assertEqual(sorted(result["skills"]), ["Gardening", "House cleaning"])
+        self.assertEqual(
+            self.client.get("/users/workers/search/").json(), {"results": []}
+        )
+
+    def test_worker_search_filters(self):
+        self.addCleanup(loaders._skill_indexes.clear)
+        Worker.objects.filter(pk=self.ben.pk).update(hourly_rate=30)
+        Worker.objects.filter(pk__in=[self.anna.pk, self.ben.pk]).update(
+            is_available=True
+        )
+
+        def search(**params):
+            response = self.client.get("/users/workers/search/", params)
+            return [result["id"] for result in response.json()["results"]]
+
+        self.assertEqual(search(q="clea", max_rate="20"), [self.anna.pk])
+        self.assertEqual(search(q="helsinki", available="1"), [self.anna.pk])
+        self.assertEqual(
+            search(skill=[self.gardening.pk, self.plumbing.pk]),
+            [self.anna.pk, self.ben.pk],
+        )
+        self.assertEqual(
+            search(skill=[self.plumbing.pk, self.cleaning.pk, self.gardening.pk]),
+            [self.anna.pk, self.ben.pk],
+        )
+        self.assertEqual(search(skill=self.plumbing.pk, max_rate="20"), [])
+        self.assertEqual(search(max_rate="x", q="plumb"), [self.ben.pk])
@@ -38,6 +38,7 @@ urlpatterns = [
         views.WorkerProfileUpdateView.as_view(),
         name="worker_profile",
     ),
+    path("workers/search/", views.worker_search, name="worker_search"),
     # Password reset views
     path(
         "password-reset/", auth_views.PasswordResetView.as_view(), name="password_reset"
@@ -2,7 +2,8 @@ from django.contrib.auth import authenticate, get_user_model, login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LogoutView
-from django.db.models import Avg
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
 from django.utils.decorators import method_decorator
@@ -16,6 +17,8 @@ from django.views.generic import (
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_bytes
+from recommendation_algorithm.loaders import worker_skill_index
+
 from .forms import (
     CustomerProfileUpdateForm,
     CustomerRegistrationForm,
@@ -24,7 +27,8 @@ from .forms import (
     WorkerRegistrationForm,
 )
 from .models import Customer, Worker
-from django.core.mail import send_mail
+from .outbox import enqueue_mail
+from .search import RESULTS, search_workers
 from django.conf import settings
 from django.contrib import messages
 from django.utils.encoding import force_bytes
@@ -80,35 +84,35 @@ class CustomerRegistrationView(CreateView):
                 form.add_error("phone_number", "Phone number already exists.")
                 return self.form_invalid(form)
 
-            # Save customer to the database
-            customer = form.save(commit=False)
-            customer.is_customer = True
-            customer.save()
-
-            # Generate unique token for the customer
-            uidb64 = urlsafe_base64_encode(force_bytes(customer.pk))
-            token = default_token_generator.make_token(customer)
-
-            # Construct the activation link
-            activation_link = f"{self.request.scheme}://{self.request.get_host()}/users/activate/{uidb64}/{token}"
-
-            # Send verification email to customer with activation link
-            send_mail(
-                subject="Verify your email",
-                message=f"Please click the link below to verify your email: {activation_link}",
-                from_email=settings.ADMIN_EMAIL,
-                recipient_list=[customer.email],
-                fail_silently=False,
-            )
+            # Save customer to the database and queue the emails in the same
+            # transaction, so they are sent only if the customer is saved
+            with transaction.atomic():
+                customer = form.save(commit=False)
+                customer.is_customer = True
+                customer.save()
+
+                # Generate unique token for the customer
+                uidb64 = urlsafe_base64_encode(force_bytes(customer.pk))
+                token = default_token_generator.make_token(customer)
+
+                # Construct the activation link
+                activation_link = f"{self.request.scheme}://{self.request.get_host()}/users/activate/{uidb64}/{token}"
+
+                # Queue verification email to customer with activation link
+                enqueue_mail(
+                    subject="Verify your email",
+                    message=f"Please click the link below to verify your email: {activation_link}",
+                    from_email=settings.ADMIN_EMAIL,
+                    recipient_list=[customer.email],
+                )
 
-            # Send notification email to admin
-            send_mail(
-                subject="New customer registration",
-                message="A new customer has registered on Freelance Household Work.",
-                from_email=settings.ADMIN_EMAIL,
-                recipient_list=[settings.ADMIN_EMAIL],
-                fail_silently=False,
-            )
+                # Queue notification email to admin
+                enqueue_mail(
+                    subject="New customer registration",
+                    message="A new customer has registered on Freelance Household Work.",
+                    from_email=settings.ADMIN_EMAIL,
+                    recipient_list=[settings.ADMIN_EMAIL],
+                )
 
             # Success message
             messages.success(
@@ -327,38 +331,38 @@ class WorkerRegistrationView(CreateView):
                 form.add_error("username", "Username already exists.")
                 return self.form_invalid(form)
 
-            # Save worker to the database
-            user = form.save(commit=False)
-            user.is_worker = True
-            user.is_active = False  # Worker is inactive until admin approves them
-            user.save()
-
-            # Create Worker model instance
-            worker = Worker.objects.create(
-                user=user,
-                phone_number=form.cleaned_data.get("phone_number"),
-                location=form.cleaned_data.get("location"),
-                skillset=form.cleaned_data.get("skills"),
-                hourly_rate=form.cleaned_data.get("hourly_rate"),
-            )
+            # Save worker to the database and queue the emails in the same
+            # transaction, so they are sent only if the worker is saved
+            with transaction.atomic():
+                user = form.save(commit=False)
+                user.is_worker = True
+                user.is_active = False  # Worker is inactive until admin approves them
+                user.save()
+
+                # Create Worker model instance
+                worker = Worker.objects.create(
+                    user=user,
+                    phone_number=form.cleaned_data.get("phone_number"),
+                    location=form.cleaned_data.get("location"),
+                    skillset=form.cleaned_data.get("skills"),
+                    hourly_rate=form.cleaned_data.get("hourly_rate"),
+                )
 
-            # Send verification email to worker
-            send_mail(
-                subject="Verify your email",
-                message="Please click the link below to verify your email.",
-                from_email="noreply@freelancehouseholdwork.com",
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
+                # Queue verification email to worker
+                enqueue_mail(
+                    subject="Verify your email",
+                    message="Please click the link below to verify your email.",
+                    from_email="noreply@freelancehouseholdwork.com",
+                    recipient_list=[user.email],
+                )
 
-            # Send notification email to admin
-            send_mail(
-                subject="New worker registration",
-                message="A new worker has registered on Freelance Household Work. Please log in to the admin panel to approve or reject the registration request.",
-                from_email="noreply@freelancehouseholdwork.com",
-                recipient_list=["admin@freelancehouseholdwork.com"],
-                fail_silently=False,
-            )
+                # Queue notification email to admin
+                enqueue_mail(
+                    subject="New worker registration",
+                    message="A new worker has registered on Freelance Household Work. Please log in to the admin panel to approve or reject the registration request.",
+                    from_email="noreply@freelancehouseholdwork.com",
+                    recipient_list=["admin@freelancehouseholdwork.com"],
+                )
 
             return super().form_valid(form)
 
@@ -489,7 +493,7 @@ class WorkerProfileView(DetailView):
         """
         Returns the context data for the view.
 
-        Adds the worker's average rating to the context.
+        Adds the worker's average rating, kept on the worker, to the context.
 
         Parameters:
         - kwargs: Additional keyword arguments.
@@ -498,12 +502,75 @@ class WorkerProfileView(DetailView):
         - dict: The context data for the view.
         """
         context = super().get_context_data(**kwargs)
-        worker = self.object
-        rating = worker.worker_rating.aggregate(Avg("rating"))
-        context["rating"] = rating["rating__avg"] or 0.0
+        context["rating"] = self.object.average_rating
         return context
 
 
+def worker_search(request):
+    """
+    Returns the workers that best match the "q" query parameter as JSON.
+
+    Searches the full-text index of worker names, skills and locations, matching every
+    word of the query as a prefix and ranking the workers by BM25.
+
+    The results can be narrowed down to the workers with at least one of the skills
+    given as "skill" ids, to those with an hourly rate of at most "max_rate" and, with
+    "available", to the available workers. These filters are answered from the
+    in-memory skill index, and without "q" the workers that have the most of the
+    skills come first.
+
+    Parameters:
+    - request (HttpRequest): The HTTP request.
+
+    Returns:
+    - JsonResponse: The matching workers, best match first.
+    """
+    text = request.GET.get("q", "")
+    skill_ids = [int(s) for s in request.GET.getlist("skill") if s.isdigit()] or None
+    try:
+        max_hourly_rate = float(request.GET["max_rate"])
+    except (KeyError, ValueError):
+        max_hourly_rate = None
+    available = True if request.GET.get("available") else None
+    if skill_ids is None and max_hourly_rate is None and available is None:
+        ranking = search_workers(text)
+    else:
+        worker_ids, matched = worker_skill_index().match(
+            skill_ids, max_hourly_rate, available
+        )
+        if text:
+            candidates = set(worker_ids.tolist())
+            ranking = [
+                (worker_id, score)
+                for worker_id, score in search_workers(text, limit=None)
+                if worker_id in candidates
+            ]
+        else:
+            ranking = list(zip(worker_ids.tolist(), matched.tolist()))
+        ranking = ranking[:RESULTS]
+    workers = Worker.objects.prefetch_related("skills").in_bulk(
+        [worker_id for worker_id, _ in ranking]
+    )
+    results = []
+    for worker_id, score in ranking:
+        worker = workers.get(worker_id)
+        if worker is None:
+            continue
+        results.append(
+            {
+                "id": worker.pk,
+                "name": str(worker),
+                "location": worker.location,
+                "skills": [skill.name for skill in worker.skills.all()],
+                "hourly_rate": worker.hourly_rate,
+                "rating": worker.average_rating,
+                "rating_count": worker.rating_count,
+                "score": score,
+            }
+        )
+    return JsonResponse({"results": results})
+
+
 @method_decorator(login_required(login_url="worker_login"), name="dispatch")
 class WorkerProfileUpdateView(UpdateView):
     """